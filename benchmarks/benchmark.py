@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extremo a extremo de generar_faltas_ods.py.
+Genera informes sintéticos a varias escalas y mide por separado la extracción,
+el análisis, la fusión, la hoja de resumen, la escritura y la lectura del ODS
+(analizando content.xml o desde el modelo que guarda dentro) y de su
+exportación a CSV, además del arranque del script cuando no hay nada que
+hacer. Los resultados se guardan en JSON para poder compararlos entre commits.
+
+Con --conformidad comprueba además que todos los motores de extracción dan
+exactamente las mismas filas que el de referencia sobre los mismos informes.
+"""
+import argparse
+import csv
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import generar_faltas_ods as gfo
+from generar_informes import generar_lote
+
+# Escalas: desde una clase con una materia hasta un centro con un curso completo
+ESCALAS = {
+    'clase': {'materias': 1, 'alumnos': 25, 'periodos': 1},
+    'grupo': {'materias': 8, 'alumnos': 30, 'periodos': 3},
+    'curso': {'materias': 10, 'alumnos': 30, 'periodos': 10},
+    'centro': {'materias': 12, 'alumnos': 150, 'periodos': 10},
+}
+ESCALAS_POR_DEFECTO = ['clase', 'grupo', 'curso']
+
+FORMATO_RESULTADOS = 1
+
+def medir(funcion, repeticiones):
+    """Ejecuta funcion repeticiones veces y devuelve (tiempos, último resultado)"""
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos, resultado
+
+def resumen_tiempos(tiempos):
+    """Estadísticas de una serie de tiempos en segundos"""
+    return {
+        'min': min(tiempos),
+        'mediana': statistics.median(tiempos),
+        'repeticiones': tiempos,
+    }
+
+def preparar_fixtures(escala, directorio):
+    """Genera (o reutiliza) los PDFs sintéticos de una escala"""
+    destino = Path(directorio) / escala
+    pdfs = sorted(destino.glob("*.pdf"))
+    if not pdfs:
+        pdfs = generar_lote(destino, semilla=1, **ESCALAS[escala])
+    return pdfs
+
+def medir_escala(escala, directorio, repeticiones, motor=gfo.MOTOR_POR_DEFECTO):
+    """Mide todas las etapas para una escala"""
+    pdfs = preparar_fixtures(escala, directorio)
+    etapas = {}
+
+    tiempos, lineas = medir(
+        lambda: [list(gfo.extraer_lineas_pdf(pdf, motor=motor)) for pdf in pdfs], repeticiones)
+    etapas['extraccion'] = resumen_tiempos(tiempos)
+
+    tiempos, _ = medir(lambda: [gfo.es_informe(next(gfo.extraer_paginas_pdf(pdf, motor=motor), []))
+                               for pdf in pdfs], repeticiones)
+    etapas['olfateo'] = resumen_tiempos(tiempos)
+
+    tiempos, resultados = medir(lambda: [gfo.analizar_lineas(l) for l in lineas], repeticiones)
+    etapas['analisis'] = resumen_tiempos(tiempos)
+
+    tiempos, hojas = medir(
+        lambda: gfo.fusionar_plan({}, gfo.planificar_fusion(resultados)), repeticiones)
+    etapas['fusion'] = resumen_tiempos(tiempos)
+
+    tiempos, _ = medir(lambda: gfo.xml_hoja_resumen(hojas), repeticiones)
+    etapas['resumen'] = resumen_tiempos(tiempos)
+
+    with tempfile.TemporaryDirectory() as temporal:
+        ods = Path(temporal) / gfo.NOMBRE_SALIDA
+        tiempos, _ = medir(lambda: gfo.crear_ods(hojas, ods), repeticiones)
+        etapas['escritura'] = resumen_tiempos(tiempos)
+
+        tiempos, _ = medir(lambda: gfo.leer_ods_existente(ods), repeticiones)
+        etapas['lectura'] = resumen_tiempos(tiempos)
+        tiempos, _ = medir(lambda: gfo.leer_modelo_ods(ods), repeticiones)
+        etapas['lectura_modelo'] = resumen_tiempos(tiempos)
+        tamano_ods = ods.stat().st_size
+
+        # Exportación en formato largo y su lectura, para comparar con la del ODS
+        exportado = Path(temporal) / "faltas.csv"
+        tiempos, _ = medir(lambda: gfo.exportar_registros(hojas, exportado, 'csv'), repeticiones)
+        etapas['exportacion'] = resumen_tiempos(tiempos)
+
+        def leer_csv():
+            with open(exportado, 'r', encoding='utf-8', newline='') as f:
+                return list(csv.reader(f))
+        tiempos, _ = medir(leer_csv, repeticiones)
+        etapas['lectura_csv'] = resumen_tiempos(tiempos)
+
+    return {
+        'parametros': ESCALAS[escala],
+        'pdfs': len(pdfs),
+        'paginas': sum(contar_paginas(pdf) for pdf in pdfs),
+        'filas': sum(len(datos) for _, _, datos in resultados),
+        'tamano_ods': tamano_ods,
+        'etapas': etapas,
+    }
+
+def medir_arranque(directorio, repeticiones):
+    """Mide ejecuciones completas del script cuando no hay trabajo que hacer.
+
+    'sin_pdfs' es un directorio vacío y 'sin_cambios' uno cuyo ODS ya está al
+    día; ambas incluyen el arranque del intérprete y las importaciones.
+    """
+    script = RAIZ / "generar_faltas_ods.py"
+
+    def ejecutar(cwd):
+        subprocess.run([sys.executable, str(script)], cwd=cwd, check=True,
+                       stdout=subprocess.DEVNULL)
+
+    vacio = Path(directorio) / "arranque_vacio"
+    vacio.mkdir(parents=True, exist_ok=True)
+    sin_cambios = Path(directorio) / "arranque_sin_cambios"
+    if not sorted(sin_cambios.glob("*.pdf")):
+        generar_lote(sin_cambios, semilla=1, **ESCALAS['clase'])
+    ejecutar(sin_cambios)
+
+    etapas = {}
+    tiempos, _ = medir(lambda: ejecutar(vacio), repeticiones)
+    etapas['sin_pdfs'] = resumen_tiempos(tiempos)
+    tiempos, _ = medir(lambda: ejecutar(sin_cambios), repeticiones)
+    etapas['sin_cambios'] = resumen_tiempos(tiempos)
+    return {'etapas': etapas}
+
+def comprobar_conformidad(escalas, directorio):
+    """Compara el análisis de cada motor con el del motor de referencia.
+
+    Devuelve una lista de (escala, motor, pdf, diferencia) con los PDFs en los
+    que la materia, el período o alguna fila no coinciden.
+    """
+    diferencias = []
+    for escala in escalas:
+        for pdf in preparar_fixtures(escala, directorio):
+            referencia = gfo.analizar_lineas(gfo.extraer_lineas_pdf(pdf, motor=gfo.MOTOR_POR_DEFECTO))
+            for motor in gfo.MOTORES_EXTRACCION:
+                if motor == gfo.MOTOR_POR_DEFECTO:
+                    continue
+                resultado = gfo.analizar_lineas(gfo.extraer_lineas_pdf(pdf, motor=motor))
+                if resultado != referencia:
+                    diferencias.append((escala, motor, pdf.name, describir_diferencia(referencia, resultado)))
+    return diferencias
+
+def describir_diferencia(referencia, resultado):
+    """Primera discrepancia entre dos resultados de analizar_lineas()"""
+    for campo, esperado, obtenido in zip(('materia', 'periodo'), referencia, resultado):
+        if esperado != obtenido:
+            return f"{campo}: {esperado!r} != {obtenido!r}"
+    filas_ref, filas = referencia[2], resultado[2]
+    for num, (esperada, obtenida) in enumerate(zip(filas_ref, filas), start=1):
+        if esperada != obtenida:
+            return f"fila {num}: {esperada!r} != {obtenida!r}"
+    return f"{len(filas_ref)} filas != {len(filas)} filas"
+
+def contar_paginas(pdf):
+    """Páginas de un PDF sintético (cuenta sus objetos /Type /Page)"""
+    return Path(pdf).read_bytes().count(b"/Type /Page ")
+
+def commit_actual():
+    """Hash del commit actual del repositorio, si está disponible"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar(base, actual):
+    """Muestra la mediana de cada etapa frente a un resultado anterior"""
+    print(f"\nComparación con {base.get('commit') or 'resultado base'}:")
+    print(f"  {'escala':<8} {'etapa':<14} {'base (s)':>10} {'actual (s)':>10} {'factor':>8}")
+    for escala, datos in actual['escalas'].items():
+        anterior = base.get('escalas', {}).get(escala)
+        if not anterior:
+            continue
+        for etapa, medida in datos['etapas'].items():
+            if etapa not in anterior['etapas']:
+                continue
+            t_base = anterior['etapas'][etapa]['mediana']
+            t_actual = medida['mediana']
+            factor = t_base / t_actual if t_actual else float('inf')
+            print(f"  {escala:<8} {etapa:<14} {t_base:>10.4f} {t_actual:>10.4f} {factor:>7.2f}x")
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Benchmark de generar_faltas_ods.py con informes sintéticos.")
+    parser.add_argument('--escalas', nargs='+', choices=list(ESCALAS), default=ESCALAS_POR_DEFECTO,
+                        help=f"Escalas a medir (por defecto: {' '.join(ESCALAS_POR_DEFECTO)})")
+    parser.add_argument('-n', '--repeticiones', type=int, default=3,
+                        help="Repeticiones de cada etapa (por defecto: 3)")
+    parser.add_argument('--fixtures', metavar='DIR',
+                        help="Directorio donde generar y reutilizar los PDFs (por defecto: uno temporal)")
+    parser.add_argument('--motor', choices=list(gfo.MOTORES_EXTRACCION), default=gfo.MOTOR_POR_DEFECTO,
+                        help=f"Motor de extracción a medir (por defecto: {gfo.MOTOR_POR_DEFECTO})")
+    parser.add_argument('--conformidad', action='store_true',
+                        help="Solo comprobar que todos los motores dan las mismas filas que el de referencia")
+    parser.add_argument('--sin-arranque', action='store_true',
+                        help="No medir el arranque del script sin trabajo que hacer")
+    parser.add_argument('-o', '--salida', metavar='JSON', help="Guardar los resultados en este archivo")
+    parser.add_argument('--comparar', metavar='JSON', help="Comparar con resultados guardados antes")
+    args = parser.parse_args()
+
+    if args.conformidad:
+        with tempfile.TemporaryDirectory() as temporal:
+            diferencias = comprobar_conformidad(args.escalas, args.fixtures or temporal)
+        for escala, motor, pdf, diferencia in diferencias:
+            print(f"⚠ {escala}/{pdf} con {motor}: {diferencia}")
+        if diferencias:
+            sys.exit(1)
+        print(f"✓ Todos los motores coinciden con {gfo.MOTOR_POR_DEFECTO} en: {' '.join(args.escalas)}")
+        return
+
+    resultados = {
+        'formato': FORMATO_RESULTADOS,
+        'commit': commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'motor': args.motor,
+        'escalas': {},
+    }
+
+    with tempfile.TemporaryDirectory() as temporal:
+        directorio = args.fixtures or temporal
+        for escala in args.escalas:
+            print(f"Midiendo escala '{escala}'...")
+            datos = medir_escala(escala, directorio, args.repeticiones, args.motor)
+            resultados['escalas'][escala] = datos
+            print(f"  {datos['pdfs']} PDFs, {datos['filas']} filas, ODS de {datos['tamano_ods']} bytes")
+            for etapa, medida in datos['etapas'].items():
+                print(f"  {etapa:<14} {medida['mediana']:.4f} s")
+
+        if not args.sin_arranque:
+            print("Midiendo el arranque...")
+            datos = medir_arranque(directorio, args.repeticiones)
+            resultados['escalas']['arranque'] = datos
+            for etapa, medida in datos['etapas'].items():
+                print(f"  {etapa:<14} {medida['mediana']:.4f} s")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\n✓ Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            comparar(json.load(f), resultados)
+
+if __name__ == "__main__":
+    main()
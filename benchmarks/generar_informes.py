@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Generador de informes de faltas sintéticos con el formato de Raíces.
+Escribe PDFs sin dependencias externas (texto con la fuente estándar Helvetica)
+para poder medir y probar generar_faltas_ods.py sin datos reales de alumnos.
+"""
+import argparse
+import calendar
+import random
+from pathlib import Path
+
+MATERIAS = [
+    "Matemáticas", "Lengua Castellana y Literatura", "Inglés", "Geografía e Historia",
+    "Biología y Geología", "Física y Química", "Educación Física",
+    "Tecnología y Digitalización", "Música", "Educación Plástica, Visual y Audiovisual",
+    "Religión", "Francés", "Latín", "Economía y Emprendimiento", "Filosofía",
+]
+
+NOMBRES = [
+    "María", "Lucía", "Martina", "Sofía", "Paula", "Julia", "Daniela", "Valeria", "Alba",
+    "Hugo", "Martín", "Lucas", "Mateo", "Leo", "Daniel", "Alejandro", "Pablo", "Manuel",
+    "Álvaro", "Adrián", "Nerea", "Íñigo", "Zoe", "Noa", "Carmen", "Jesús", "Ángela",
+]
+
+APELLIDOS = [
+    "García", "Rodríguez", "González", "Fernández", "López", "Martínez", "Sánchez",
+    "Pérez", "Gómez", "Martín", "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno", "Muñoz",
+    "Álvarez", "Romero", "Alonso", "Gutiérrez", "Navarro", "Torres", "Domínguez", "Vázquez",
+    "Ramos", "Gil", "Ramírez", "Serrano", "Blanco", "Molina", "Morales", "Suárez", "Ortega",
+    "Delgado", "Castro", "Ortiz", "Rubio", "Marín", "Sanz", "Núñez", "Iglesias", "Medina",
+]
+
+# Geometría de la página (A4 en puntos)
+ANCHO_PAGINA = 595
+ALTO_PAGINA = 842
+MARGEN_SUPERIOR = 800
+MARGEN_INFERIOR = 60
+INTERLINEADO = 14
+COLUMNAS_NUMEROS = [330, 370, 410, 460, 510]
+
+def _escape_pdf(texto):
+    """Escapar caracteres especiales de una cadena PDF"""
+    return texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def escribir_pdf(paginas, destino):
+    """Escribe un PDF mínimo con una página por elemento de paginas.
+
+    Cada página es una lista de (x, y, tamaño, texto) con el texto en Helvetica.
+    """
+    objetos = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+               b"/Encoding /WinAnsiEncoding >>"]
+    hijos = []
+    for pagina in paginas:
+        operaciones = b"\n".join(
+            b"BT /F1 %d Tf %.2f %.2f Td (" % (tamano, x, y)
+            + _escape_pdf(texto).encode('cp1252') + b") Tj ET"
+            for x, y, tamano, texto in pagina)
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(operaciones)
+                       + operaciones + b"\nendstream")
+        objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+                       % (ANCHO_PAGINA, ALTO_PAGINA, len(objetos)))
+        hijos.append(len(objetos))
+    objetos[1] = (b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % h for h in hijos)
+                  + b"] /Count %d >>" % len(hijos))
+
+    salida = bytearray(b"%PDF-1.4\n")
+    posiciones = []
+    for num, objeto in enumerate(objetos, start=1):
+        posiciones.append(len(salida))
+        salida += b"%d 0 obj\n" % num + objeto + b"\nendobj\n"
+    inicio_xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicion in posiciones:
+        salida += b"%010d 00000 n \n" % posicion
+    salida += (b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+               % (len(objetos) + 1, inicio_xref))
+    Path(destino).write_bytes(bytes(salida))
+
+def generar_alumnos(num_alumnos, rnd):
+    """Lista de nombres 'Apellido Apellido, Nombre' distintos"""
+    alumnos = []
+    vistos = set()
+    while len(alumnos) < num_alumnos:
+        nombre = f"{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}, {rnd.choice(NOMBRES)}"
+        if nombre in vistos:
+            nombre = f"{nombre} {len(alumnos)}"
+        vistos.add(nombre)
+        alumnos.append(nombre)
+    return alumnos
+
+def generar_periodos(num_periodos, anio_inicio=2025, mes_inicio=9):
+    """Períodos mensuales consecutivos 'DD/MM/YYYY - DD/MM/YYYY' desde septiembre"""
+    periodos = []
+    anio, mes = anio_inicio, mes_inicio
+    for _ in range(num_periodos):
+        ultimo_dia = calendar.monthrange(anio, mes)[1]
+        periodos.append(f"01/{mes:02d}/{anio} - {ultimo_dia:02d}/{mes:02d}/{anio}")
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return periodos
+
+def paginas_informe(materia, periodo, filas, grupo="1º ESO A"):
+    """Maqueta un informe de faltas de Raíces: cabecera, tabla paginada y pie"""
+    paginas = []
+    restantes = list(filas)
+    while True:
+        pagina = []
+        y = MARGEN_SUPERIOR
+        if not paginas:
+            for texto in ("Informe de faltas de asistencia del alumnado por materia",
+                          "Centro: I.E.S. Ejemplo   Año académico: 2025/2026",
+                          f"Curso: {grupo}   Profesor/a: Docente de prueba",
+                          f"Periodo: ({periodo})"):
+                pagina.append((40, y, 10, texto))
+                y -= INTERLINEADO
+            y -= INTERLINEADO / 2
+
+        # Cabecera de la tabla (se repite en cada página)
+        pagina.append((40, y, 9, "Alumno/a"))
+        pagina.append((200, y, 9, materia))
+        pagina.append((COLUMNAS_NUMEROS[-1], y, 9, "TOTAL"))
+        y -= INTERLINEADO
+        for x, texto in zip(COLUMNAS_NUMEROS, ("FJ", "FI", "R", "FJ+FI", "Total")):
+            pagina.append((x, y, 8, texto))
+        y -= INTERLINEADO
+
+        while restantes and y > MARGEN_INFERIOR + 2 * INTERLINEADO:
+            nombre, fj, fi, r = restantes.pop(0)
+            pagina.append((40, y, 9, nombre))
+            for x, valor in zip(COLUMNAS_NUMEROS, (fj, fi, r, fj + fi, fj + fi + r)):
+                pagina.append((x, y, 9, str(valor)))
+            y -= INTERLINEADO
+
+        if not restantes:
+            totales = [sum(fila[i] for fila in filas) for i in (1, 2, 3)]
+            pagina.append((40, y, 9, "TOTALES"))
+            for x, valor in zip(COLUMNAS_NUMEROS, totales + [totales[0] + totales[1], sum(totales)]):
+                pagina.append((x, y, 9, str(valor)))
+
+        paginas.append(pagina)
+        pagina.append((40, MARGEN_INFERIOR - 20, 7,
+                       f"Cód.Centro: 28000000   Ref.Doc.: InfFalAluMat   Página {len(paginas)}"))
+        if not restantes:
+            return paginas
+
+def generar_lote(destino, materias=3, alumnos=25, periodos=1, semilla=0, rotacion=0.1):
+    """Genera un PDF por materia y período en destino y devuelve sus rutas.
+
+    rotacion es la fracción de alumnos que se incorporan o se dan de baja a lo
+    largo del curso, para que las hojas tengan celdas vacías como en la realidad.
+    """
+    rnd = random.Random(semilla)
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+
+    nombres_materias = [MATERIAS[i] if i < len(MATERIAS) else f"Optativa {i - len(MATERIAS) + 1}"
+                        for i in range(materias)]
+    lista_alumnos = generar_alumnos(alumnos, rnd)
+    lista_periodos = generar_periodos(periodos)
+
+    # Alumnos que se incorporan tarde o se dan de baja: (primer, último) período
+    matricula = {}
+    for nombre in lista_alumnos:
+        if rnd.random() < rotacion and periodos > 1:
+            if rnd.random() < 0.5:
+                matricula[nombre] = (rnd.randrange(1, periodos), periodos - 1)
+            else:
+                matricula[nombre] = (0, rnd.randrange(0, periodos - 1))
+        else:
+            matricula[nombre] = (0, periodos - 1)
+
+    rutas = []
+    for num_materia, materia in enumerate(nombres_materias):
+        for num_periodo, periodo in enumerate(lista_periodos):
+            filas = [(nombre, rnd.choice((0, 0, 0, 1, 2, 3, 5)), rnd.choice((0, 0, 0, 1, 2, 4)),
+                      rnd.choice((0, 0, 0, 0, 1, 2)))
+                     for nombre in lista_alumnos
+                     if matricula[nombre][0] <= num_periodo <= matricula[nombre][1]]
+            ruta = destino / f"faltas_{num_materia + 1:02d}_{num_periodo + 1:02d}.pdf"
+            escribir_pdf(paginas_informe(materia, periodo, filas), ruta)
+            rutas.append(ruta)
+    return rutas
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Genera PDFs de faltas sintéticos con el formato de Raíces.")
+    parser.add_argument('destino', help="Directorio donde escribir los PDFs")
+    parser.add_argument('--materias', type=int, default=3, help="Número de materias (por defecto: 3)")
+    parser.add_argument('--alumnos', type=int, default=25, help="Alumnos por grupo (por defecto: 25)")
+    parser.add_argument('--periodos', type=int, default=1, help="Períodos mensuales (por defecto: 1)")
+    parser.add_argument('--semilla', type=int, default=0, help="Semilla aleatoria (por defecto: 0)")
+    args = parser.parse_args()
+
+    rutas = generar_lote(args.destino, args.materias, args.alumnos, args.periodos, args.semilla)
+    print(f"✓ {len(rutas)} PDFs generados en {args.destino}")
+
+if __name__ == "__main__":
+    main()
@@ -3,110 +3,441 @@
 Script para convertir PDFs de faltas a un archivo ODS con múltiples hojas.
 Procesa todos los PDFs en el directorio actual y genera un archivo ODS.
 """
+import time
+
+# Instante de arranque, antes de importar el resto de módulos (para medir el arranque).
+# Las dependencias pesadas (pdfplumber, zipfile, el pool de procesos, ElementTree)
+# se importan dentro de las funciones que las usan, solo cuando hay trabajo que hacer.
+INICIO_PROGRAMA = time.perf_counter()
+
+import argparse
+import contextlib
+import functools
+import hashlib
+import io
+import itertools
+import json
+import os
 import re
-import zipfile
+import sys
 from pathlib import Path
-from xml.etree.ElementTree import Element, SubElement, tostring
-from xml.dom import minidom
-import pdfplumber
 
 # Configuración
 NOMBRE_SALIDA = "faltas_consolidado.ods"
+# Hoja con los totales de cada alumno en todas las materias (se regenera en cada escritura)
+NOMBRE_HOJA_RESUMEN = "Resumen (todas las materias)"
+
+# Caché de extracciones (una entrada por PDF, identificada por el hash de su contenido)
+DIRECTORIO_CACHE = ".cache_faltas"
+TAMANO_MAXIMO_CACHE_MB = 50
+# Incrementar al cambiar las reglas de extracción o análisis: invalida las entradas antiguas
+VERSION_CACHE = 1
+# Firma de la última ejecución (tamaño y fecha de los PDFs y del ODS), dentro de la caché
+ARCHIVO_ESTADO = "ultima_ejecucion.estado"
+
+# Modo vigilancia: segundos entre comprobaciones del directorio y segundos sin
+# cambios que se esperan antes de reescribir el ODS
+INTERVALO_VIGILANCIA = 2.0
+ESPERA_ESCRITURA = 5.0
+
+# Modo servicio (--servir): solo escucha en la propia máquina. Cada libro es un
+# subdirectorio del directorio actual con su propio ODS
+HOST_SERVICIO = "127.0.0.1"
+PUERTO_SERVICIO = 8765
+TAMANO_MAXIMO_PETICION_MB = 100
+# Lotes que se procesan a la vez (de libros distintos); el resto esperan en cola
+TRABAJOS_SIMULTANEOS = 4
+
+def _paginas_pdfplumber(pdf_path, limite_paginas=None):
+    """Motor de referencia: líneas de cada página según page.extract_text() de pdfplumber"""
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        comprobar_paginas(len(pdf.pages), limite_paginas)
+        for page in pdf.pages:
+            texto = page.extract_text()
+            page.close()
+            yield texto.split('\n') if texto else []
+
+# Ligaduras que pdfplumber expande al extraer el texto
+LIGADURAS = {'ﬀ': 'ff', 'ﬃ': 'ffi', 'ﬄ': 'ffl', 'ﬁ': 'fi', 'ﬂ': 'fl', 'ﬆ': 'st', 'ﬅ': 'st'}
+
+def _paginas_pdfminer(pdf_path, limite_paginas=None):
+    """Motor rápido: caracteres de pdfminer sin análisis de maquetación.
+
+    Los informes de Raíces son una tabla de maquetación fija, así que basta con
+    agrupar los caracteres en líneas por su altura y en palabras por la
+    distancia entre ellos, con las mismas tolerancias que usa pdfplumber.
+    """
+    from pdfminer.converter import PDFPageAggregator
+    from pdfminer.layout import LTChar, LTContainer
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+
+    # Los objetos tipo archivo se usan tal cual (y no se cierran)
+    archivo = contextlib.nullcontext(pdf_path) if hasattr(pdf_path, 'read') else open(pdf_path, 'rb')
+    with archivo as f:
+        # El árbol de páginas se recorre sin interpretar ninguna, para contarlas
+        paginas = list(PDFPage.create_pages(PDFDocument(PDFParser(f))))
+        comprobar_paginas(len(paginas), limite_paginas)
+        gestor = PDFResourceManager(caching=True)
+        dispositivo = PDFPageAggregator(gestor, laparams=None)
+        interprete = PDFPageInterpreter(gestor, dispositivo)
+        for pagina in paginas:
+            interprete.process_page(pagina)
+            layout = dispositivo.get_result()
+            # (distancia al borde superior, x0, x1, texto) de cada carácter,
+            # incluidos los que están dentro de figuras
+            caracteres = []
+            pendientes = [layout]
+            while pendientes:
+                for objeto in pendientes.pop():
+                    if isinstance(objeto, LTChar):
+                        caracteres.append((layout.y1 - objeto.y1, objeto.x0, objeto.x1,
+                                           objeto.get_text()))
+                    elif isinstance(objeto, LTContainer):
+                        pendientes.append(objeto)
+            yield agrupar_caracteres(caracteres)
+
+def agrupar_caracteres(caracteres, tolerancia_x=3, tolerancia_y=3):
+    """Reconstruye las líneas de texto a partir de (top, x0, x1, texto) de cada carácter"""
+    caracteres.sort(key=lambda c: c[0])
+    grupos = []
+    grupo = []
+    ultimo = None
+    for caracter in caracteres:
+        if ultimo is not None and caracter[0] > ultimo + tolerancia_y:
+            grupos.append(grupo)
+            grupo = []
+        grupo.append(caracter)
+        ultimo = caracter[0]
+    if grupo:
+        grupos.append(grupo)
+
+    lineas = []
+    for grupo in grupos:
+        grupo.sort(key=lambda c: c[1])
+        palabras = []
+        palabra = []
+        anterior = None
+        for top, x0, x1, texto in grupo:
+            if texto.isspace():
+                if palabra:
+                    palabras.append(''.join(palabra))
+                    palabra = []
+                anterior = None
+                continue
+            if anterior is not None and (x0 < anterior[1] or x0 > anterior[2] + tolerancia_x
+                                         or abs(top - anterior[0]) > tolerancia_y):
+                palabras.append(''.join(palabra))
+                palabra = []
+            palabra.append(LIGADURAS.get(texto, texto))
+            anterior = (top, x0, x1)
+        if palabra:
+            palabras.append(''.join(palabra))
+        if palabras:
+            lineas.append(' '.join(palabras))
+    return lineas
+
+# Motores de extracción: cada uno genera, para cada página, la lista de sus líneas.
+# Con limite_paginas, lanzan LimiteSuperado nada más abrir el PDF si tiene más.
+# pdfplumber es la referencia; pdfminer da las mismas líneas en los informes de
+# Raíces en menos de la mitad de tiempo (ver benchmarks/benchmark.py --conformidad)
+MOTORES_EXTRACCION = {
+    'pdfplumber': _paginas_pdfplumber,
+    'pdfminer': _paginas_pdfminer,
+}
+MOTOR_POR_DEFECTO = 'pdfplumber'
+
+def comprobar_paginas(num_paginas, limite_paginas=None):
+    """Lanza LimiteSuperado si un PDF tiene más páginas de las permitidas"""
+    if limite_paginas is not None and num_paginas > limite_paginas:
+        raise LimiteSuperado(f"tiene {num_paginas} páginas (el límite es {limite_paginas})")
+
+def precargar_motor():
+    """Importa pdfplumber (y con él pdfminer) por adelantado, para que la importación
+    no cuente en el primer PDF (modo servicio, trabajadores con límites)"""
+    import pdfplumber  # noqa: F401
+
+def extraer_paginas_pdf(pdf_path, metricas=None, motor=MOTOR_POR_DEFECTO, limite_paginas=None):
+    """Genera las líneas de texto de un PDF página a página (una lista por página)
+    con el motor indicado.
+
+    pdf_path puede ser una ruta, un objeto tipo archivo binario (abierto y con
+    acceso aleatorio, como io.BytesIO) o un MiembroZip.
+    Cada página se libera en cuanto se han entregado sus líneas, de modo que la
+    memoria necesaria es la de una página y no la del documento completo.
+    Si se pasa un diccionario metricas, se acumulan en él las páginas, las
+    líneas y el tiempo de extracción. Con limite_paginas se lanza
+    LimiteSuperado antes de extraer nada si el PDF tiene más páginas.
+    """
+    if isinstance(pdf_path, MiembroZip):
+        pdf_path = pdf_path.abrir()
+    paginas = MOTORES_EXTRACCION[motor](pdf_path, limite_paginas)
+    if metricas is None:
+        yield from paginas
+        return
 
-def extraer_texto_pdf(pdf_path):
-    """Extrae el texto de un PDF usando pdfplumber"""
+    while True:
+        inicio = time.perf_counter()
+        lineas = next(paginas, None)
+        metricas['segundos_extraccion'] += time.perf_counter() - inicio
+        if lineas is None:
+            return
+        metricas['paginas'] += 1
+        metricas['lineas'] += len(lineas)
+        yield lineas
+
+def extraer_lineas_pdf(pdf_path, metricas=None, motor=MOTOR_POR_DEFECTO, limite_paginas=None):
+    """Genera las líneas de texto de un PDF una a una (ver extraer_paginas_pdf())"""
+    for lineas in extraer_paginas_pdf(pdf_path, metricas, motor, limite_paginas):
+        yield from lineas
+
+def extraer_texto_pdf(pdf_path, motor=MOTOR_POR_DEFECTO):
+    """Extrae el texto de un PDF (ruta u objeto tipo archivo) con el motor indicado"""
     try:
-        texto_completo = []
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                texto = page.extract_text()
-                if texto:
-                    texto_completo.append(texto)
-        return '\n'.join(texto_completo)
+        return '\n'.join(extraer_lineas_pdf(pdf_path, motor=motor))
     except Exception as e:
         print(f"  ⚠ Error al extraer texto: {e}")
         return None
 
-def extraer_nombre_materia(texto):
-    """Extrae el nombre de la materia de la cabecera de la tabla"""
-    lineas = texto.split('\n')
+class MiembroZip:
+    """Un PDF dentro de un archivo ZIP, que se lee en memoria sin extraerlo al disco.
+
+    Solo guarda dónde está el PDF, así que es ligero de crear y de enviar a los
+    procesos trabajadores; el contenido se lee al llamar a abrir().
+    """
+
+    def __init__(self, archivo_zip, nombre_miembro):
+        self.archivo_zip = Path(archivo_zip)
+        self.nombre_miembro = nombre_miembro
+
+    @property
+    def name(self):
+        """Nombre para los mensajes: el del ZIP seguido de la ruta dentro de él"""
+        return f"{self.archivo_zip.name}/{self.nombre_miembro}"
+
+    def abrir(self):
+        """Lee el PDF del ZIP y lo devuelve como un io.BytesIO con su nombre"""
+        import zipfile
+
+        with zipfile.ZipFile(self.archivo_zip) as zf:
+            archivo = io.BytesIO(zf.read(self.nombre_miembro))
+        archivo.name = self.name
+        return archivo
+
+def miembros_zip(archivos_zip):
+    """Lista los PDFs de los ZIP indicados (también los de sus subcarpetas), en orden"""
+    import zipfile
+
+    miembros = []
+    for archivo_zip in archivos_zip:
+        try:
+            with zipfile.ZipFile(archivo_zip) as zf:
+                infos = zf.infolist()
+        except (OSError, zipfile.BadZipFile) as e:
+            print(f"⚠ No se pudo abrir {archivo_zip}: {e}")
+            continue
+        for info in sorted(infos, key=lambda i: i.filename):
+            if es_pdf_en_zip(info):
+                miembros.append(MiembroZip(archivo_zip, info.filename))
+    return miembros
+
+def es_pdf_en_zip(info):
+    """True si una entrada de un ZIP (ZipInfo) es un PDF: se saltan las carpetas y
+    los metadatos que añade macOS al comprimir"""
+    return (not info.is_dir() and info.filename.lower().endswith('.pdf')
+            and not info.filename.startswith('__MACOSX/'))
+
+def leer_por_adelantado(origenes, cargar, adelanto=1):
+    """Genera cargar(origen) para cada origen, en orden, preparando en un hilo los
+    `adelanto` siguientes mientras se usa el actual, para solapar la lectura
+    (red, descompresión, hash) con el análisis."""
+    import collections
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=1) as hilo:
+        siguientes = collections.deque()
+        try:
+            for origen in origenes:
+                siguientes.append(hilo.submit(cargar, origen))
+                if len(siguientes) > adelanto:
+                    yield siguientes.popleft().result()
+            while siguientes:
+                yield siguientes.popleft().result()
+        finally:
+            for futuro in siguientes:
+                futuro.cancel()
+
+def nombre_pdf(pdf_path):
+    """Nombre de un PDF para los mensajes, sea una ruta, un MiembroZip o un objeto tipo archivo"""
+    if isinstance(pdf_path, Path):
+        return pdf_path.name
+    return getattr(pdf_path, 'name', None) or "(PDF en memoria)"
+
+# Patrones de las líneas de un informe de faltas de Raíces (compilados una sola vez)
+PATRON_MATERIA = re.compile(r'Alumno/a\s+(.+?)\s+TOTAL')
+PATRON_PERIODO = re.compile(r'Periodo:\s*\((\d{2}/\d{2}/\d{4}\s*-\s*\d{2}/\d{2}/\d{4})\)')
+PATRON_FILA = re.compile(r'^(.+?)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s*$')
+PATRON_ESPACIOS = re.compile(r'\s+')
+# Textos que indican que una línea con números no es la de un alumno
+PATRON_NO_ALUMNO = re.compile('|'.join(re.escape(palabra) for palabra in
+    ['alumno', 'año académico', 'curso', 'profesor', 'fecha', 'cód.centro', 'ref.doc']))
+
+def _materia_de_linea(linea):
+    """Nombre de la materia si la línea es la cabecera de la tabla, o None"""
+    # Buscar la línea que contiene "Alumno/a" y "TOTAL"
+    if 'Alumno/a' in linea and 'TOTAL' in linea:
+        # Extraer el texto entre "Alumno/a" y "TOTAL"
+        match = PATRON_MATERIA.search(linea)
+        if match:
+            # Limpiar espacios múltiples
+            return PATRON_ESPACIOS.sub(' ', match.group(1).strip())
+    return None
 
-    for linea in lineas:
-        # Buscar la línea que contiene "Alumno/a" y "TOTAL"
-        if 'Alumno/a' in linea and 'TOTAL' in linea:
-            # Extraer el texto entre "Alumno/a" y "TOTAL"
-            match = re.search(r'Alumno/a\s+(.+?)\s+TOTAL', linea)
-            if match:
-                nombre_materia = match.group(1).strip()
-                # Limpiar espacios múltiples
-                nombre_materia = re.sub(r'\s+', ' ', nombre_materia)
-                return nombre_materia
+def _periodo_de_linea(linea):
+    """Período (fechas) si la línea es la del período del informe, o None"""
+    # Buscar el patrón "Periodo: (DD/MM/YYYY - DD/MM/YYYY)"
+    if 'Periodo:' in linea:
+        match = PATRON_PERIODO.search(linea)
+        if match:
+            return match.group(1).strip()
+    return None
+
+def _fila_de_linea(linea):
+    """Fila [nombre, fj, fi, r] si la línea es la de un alumno, o None"""
+    linea = linea.strip()
+
+    # Comprobación rápida antes de la expresión regular: las filas de alumnos
+    # terminan en un número. Se saltan también las líneas vacías y las de totales.
+    if not linea[-1:].isdigit() or 'TOTALES' in linea:
+        return None
 
+    # El patrón es: Nombre (puede contener comas y espacios) + números separados por espacios
+    match = PATRON_FILA.match(linea)
+    if not match:
+        return None
+
+    nombre = match.group(1).strip()
+    # Filtrar nombres que parecen ser encabezados o texto no relevante
+    if nombre and not PATRON_NO_ALUMNO.search(nombre.lower()):
+        return [nombre, match.group(2), match.group(3), match.group(4)]
+    return None
+
+def extraer_nombre_materia(texto):
+    """Extrae el nombre de la materia de la cabecera de la tabla"""
+    for linea in texto.split('\n'):
+        nombre_materia = _materia_de_linea(linea)
+        if nombre_materia:
+            return nombre_materia
     return None
 
 def extraer_periodo(texto):
     """Extrae el período (fechas) del documento PDF"""
-    lineas = texto.split('\n')
-
-    for linea in lineas:
-        # Buscar el patrón "Periodo: (DD/MM/YYYY - DD/MM/YYYY)"
-        match = re.search(r'Periodo:\s*\((\d{2}/\d{2}/\d{4}\s*-\s*\d{2}/\d{2}/\d{4})\)', linea)
-        if match:
-            return match.group(1).strip()
-
+    for linea in texto.split('\n'):
+        periodo = _periodo_de_linea(linea)
+        if periodo:
+            return periodo
     return None
 
 def parsear_tabla(texto):
     """Parsea el texto extraído para obtener los datos de la tabla"""
-    lineas = texto.split('\n')
+    return [fila for fila in map(_fila_de_linea, texto.split('\n')) if fila]
+
+def analizar_lineas(lineas):
+    """Obtiene materia, período y filas de alumnos recorriendo las líneas una sola vez.
+
+    Acepta cualquier iterable (por ejemplo, el generador de extraer_lineas_pdf()),
+    así que el documento se analiza a medida que se extrae. La cabecera y el
+    período solo se buscan hasta encontrarlos; el resto de líneas pasan por la
+    comprobación rápida de _fila_de_linea() antes de aplicar ninguna expresión regular.
+    """
+    nombre_materia = None
+    periodo = None
     datos = []
+    fila_de_linea = _fila_de_linea
 
     for linea in lineas:
-        # Saltar líneas vacías o de totales
-        if not linea.strip() or 'TOTALES' in linea:
-            continue
-
-        # Buscar líneas que contengan nombres de alumnos
-        # El patrón es: Nombre (puede contener comas y espacios) + números separados por espacios
-        match = re.search(r'^(.+?)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s*$', linea.strip())
+        if nombre_materia is None:
+            nombre_materia = _materia_de_linea(linea)
+        if periodo is None:
+            periodo = _periodo_de_linea(linea)
+        fila = fila_de_linea(linea)
+        if fila:
+            datos.append(fila)
 
-        if match:
-            nombre = match.group(1).strip()
-            fj = match.group(2)
-            fi = match.group(3)
-            r = match.group(4)
-
-            # Filtrar nombres que parecen ser encabezados o texto no relevante
-            if nombre and not any(palabra in nombre.lower() for palabra in
-                ['alumno', 'año académico', 'curso', 'profesor', 'fecha', 'cód.centro', 'ref.doc']):
-                datos.append([nombre, fj, fi, r])
-
-    return datos
-
-def procesar_pdf(pdf_path):
-    """Procesa un PDF y devuelve el nombre de la materia, el período y los datos"""
-    print(f"Procesando: {pdf_path.name}")
+    return nombre_materia, periodo, datos
 
-    # Extraer texto del PDF
-    texto = extraer_texto_pdf(pdf_path)
-    if not texto:
+def es_informe(lineas):
+    """True si entre estas líneas (las de la primera página de un PDF) está la
+    cabecera de la tabla o el período de un informe de faltas de Raíces"""
+    return any(_materia_de_linea(linea) or _periodo_de_linea(linea) for linea in lineas)
+
+class NoEsInforme(Exception):
+    """La primera página de un PDF no es la de un informe de faltas de Raíces: se
+    descarta sin extraer el resto (circulares, horarios, escaneos...)"""
+
+class LimiteSuperado(Exception):
+    """Un PDF ha superado alguno de los límites por documento (--limite-*) y se omite.
+
+    segundos es lo que llevaba su trabajador cuando PoolLimitado lo detuvo.
+    """
+
+    def __init__(self, motivo, segundos=0.0):
+        super().__init__(motivo)
+        self.segundos = segundos
+
+def procesar_pdf(pdf_path, metricas_pdf=None, motor=MOTOR_POR_DEFECTO, limite_paginas=None,
+                 filtrar=False):
+    """Procesa un PDF y devuelve el nombre de la materia, el período y los datos
+
+    pdf_path puede ser una ruta, un objeto tipo archivo binario o un MiembroZip.
+    motor es el nombre del motor de extracción (una clave de MOTORES_EXTRACCION).
+    Si se pasa un diccionario metricas_pdf, se rellena con las páginas, líneas,
+    filas y tiempos del documento.
+    Los PDFs que superan limite_paginas (LimiteSuperado) o agotan la memoria
+    (MemoryError) no se dan por erróneos: la excepción llega a quien lo llama,
+    que decide omitirlos. Con filtrar, si la primera página no es la de un
+    informe (ver es_informe()) se lanza NoEsInforme sin extraer las demás.
+    """
+    print(f"Procesando: {nombre_pdf(pdf_path)}")
+
+    if metricas_pdf is not None:
+        metricas_pdf.update(paginas=0, lineas=0, filas=0, segundos_extraccion=0.0)
+        inicio = time.perf_counter()
+
+    # Extraer y analizar el texto del PDF página a página, mirando antes la
+    # primera para no leer entero lo que no es un informe
+    try:
+        paginas = extraer_paginas_pdf(pdf_path, metricas_pdf, motor, limite_paginas)
+        primera = next(paginas, [])
+        if filtrar and not es_informe(primera):
+            paginas.close()
+            raise NoEsInforme()
+        nombre_materia, periodo, datos = analizar_lineas(
+            itertools.chain(primera, itertools.chain.from_iterable(paginas)))
+    except (LimiteSuperado, MemoryError, NoEsInforme):
+        raise
+    except Exception as e:
+        print(f"  ⚠ Error al extraer texto: {e}")
         return None, None, None
+    finally:
+        if metricas_pdf is not None:
+            metricas_pdf['segundos'] = time.perf_counter() - inicio
+
+    if metricas_pdf is not None:
+        metricas_pdf['filas'] = len(datos)
 
-    # Extraer nombre de la materia
-    nombre_materia = extraer_nombre_materia(texto)
     if not nombre_materia:
         print(f"  ⚠ No se pudo encontrar el nombre de la materia")
         return None, None, None
 
-    # Extraer período
-    periodo = extraer_periodo(texto)
     if not periodo:
         print(f"  ⚠ No se pudo encontrar el período")
         return None, None, None
 
-    # Parsear la tabla
-    datos = parsear_tabla(texto)
-
     if not datos:
         print(f"  ⚠ No se encontraron datos")
         return None, None, None
@@ -114,6 +445,784 @@ def procesar_pdf(pdf_path):
     print(f"  ✓ Materia: '{nombre_materia}' - Período: '{periodo}' ({len(datos)} alumnos)")
     return nombre_materia, periodo, datos
 
+class Metricas:
+    """Tiempos por etapa y por PDF de una ejecución.
+
+    Solo se crea cuando se piden métricas (--metricas); sin ellas el programa
+    no mide nada.
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self.pdfs = []
+
+    @contextlib.contextmanager
+    def etapa(self, nombre):
+        """Acumula el tiempo de un bloque en la etapa indicada"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas[nombre] = self.etapas.get(nombre, 0.0) + time.perf_counter() - inicio
+
+    def pdfs_mas_lentos(self, cantidad=5):
+        """Los PDFs que más tardaron en procesarse"""
+        return sorted((m for m in self.pdfs if not m.get('en_cache')),
+                      key=lambda m: m.get('segundos', 0.0), reverse=True)[:cantidad]
+
+    def informe(self):
+        """Resumen de la ejecución en un diccionario serializable a JSON"""
+        return {
+            'segundos_arranque': self.inicio - INICIO_PROGRAMA,
+            'segundos_total': time.perf_counter() - self.inicio,
+            'etapas': self.etapas,
+            'memoria_maxima_kb': memoria_maxima_kb(),
+            'memoria_maxima_trabajadores_kb': max(
+                (m['memoria_trabajador_kb'] for m in self.pdfs if m.get('memoria_trabajador_kb')),
+                default=None),
+            'pdfs': {
+                'total': len(self.pdfs),
+                'en_cache': sum(1 for m in self.pdfs if m.get('en_cache')),
+                'paginas': sum(m.get('paginas', 0) for m in self.pdfs),
+                'filas': sum(m.get('filas', 0) for m in self.pdfs),
+            },
+            'mas_lentos': self.pdfs_mas_lentos(),
+            'por_pdf': self.pdfs,
+        }
+
+    def guardar(self, ruta):
+        """Escribe el informe en un archivo JSON"""
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.informe(), f, indent=2, ensure_ascii=False)
+
+    def mostrar_resumen(self):
+        """Imprime los tiempos por etapa y los PDFs más lentos"""
+        informe = self.informe()
+        print(f"\nArranque: {informe['segundos_arranque'] * 1000:.0f} ms")
+        print(f"Tiempos por etapa (total {informe['segundos_total']:.2f} s):")
+        for nombre, segundos in self.etapas.items():
+            print(f"  - {nombre}: {segundos:.3f} s")
+        if informe['memoria_maxima_kb']:
+            print(f"  - Memoria máxima: {informe['memoria_maxima_kb'] / 1024:.1f} MB")
+        if informe['memoria_maxima_trabajadores_kb']:
+            print("  - Memoria máxima de un trabajador: "
+                  f"{informe['memoria_maxima_trabajadores_kb'] / 1024:.1f} MB")
+        if informe['mas_lentos']:
+            print("PDFs más lentos:")
+            for m in informe['mas_lentos']:
+                print(f"  - {m['archivo']}: {m['segundos']:.3f} s "
+                      f"({m['paginas']} páginas, {m['filas']} filas)")
+
+def _medir(metricas, etapa):
+    """Contexto que mide una etapa si hay métricas activas y no hace nada si no"""
+    return metricas.etapa(etapa) if metricas is not None else contextlib.nullcontext()
+
+def memoria_maxima_kb():
+    """Memoria máxima usada por este proceso, en KB (None si no se puede medir)"""
+    try:
+        import resource
+    except ImportError:
+        # Windows no tiene el módulo resource
+        return None
+    maxima = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS devuelve bytes; Linux, kilobytes
+    return maxima // 1024 if sys.platform == 'darwin' else maxima
+
+def _motivo_omision(error):
+    """Texto para el informe de un LimiteSuperado o un MemoryError"""
+    return str(error) if isinstance(error, LimiteSuperado) else "se quedó sin memoria"
+
+def _procesar_pdf_con_estado(pdf_path, metricas_pdf=None, motor=MOTOR_POR_DEFECTO,
+                            limite_paginas=None, filtrar=False):
+    """Ejecuta procesar_pdf() y devuelve (resultado, estado, motivo).
+
+    estado es 'leido', 'error', 'descartado' (no es un informe) u 'omitido'
+    (ha superado los límites; motivo dice cuál).
+    """
+    try:
+        resultado = procesar_pdf(pdf_path, metricas_pdf, motor, limite_paginas, filtrar)
+    except NoEsInforme:
+        print("  ⚠ No es un informe de faltas de Raíces: se descarta sin leerlo entero")
+        return (None, None, None), 'descartado', None
+    except (LimiteSuperado, MemoryError) as e:
+        motivo = _motivo_omision(e)
+        print(f"  ⚠ Omitido: {motivo}")
+        return (None, None, None), 'omitido', motivo
+    return resultado, 'leido' if all(resultado) else 'error', None
+
+def _procesar_pdf_capturando(pdf_path, con_metricas=False, motor=MOTOR_POR_DEFECTO,
+                             limite_paginas=None, filtrar=False):
+    """Ejecuta procesar_pdf() en un proceso trabajador capturando los mensajes por pantalla.
+
+    Devuelve (resultado, mensajes, metricas_pdf, estado, motivo), con estado y
+    motivo como en _procesar_pdf_con_estado(). Con métricas, anota también la
+    memoria máxima que ha usado el trabajador hasta ahora.
+    """
+    metricas_pdf = {} if con_metricas else None
+    salida = io.StringIO()
+    with contextlib.redirect_stdout(salida):
+        resultado, estado, motivo = _procesar_pdf_con_estado(pdf_path, metricas_pdf, motor,
+                                                             limite_paginas, filtrar)
+    if con_metricas:
+        metricas_pdf['memoria_trabajador_kb'] = memoria_maxima_kb()
+    return resultado, salida.getvalue(), metricas_pdf, estado, motivo
+
+def _omitido(pdf_path, motivo, con_metricas=False, segundos=0.0):
+    """Resultado (como el de _procesar_pdf_capturando()) de un PDF cuyo trabajador se ha matado"""
+    metricas_pdf = ({'paginas': 0, 'lineas': 0, 'filas': 0, 'segundos': segundos}
+                    if con_metricas else None)
+    salida = f"Procesando: {nombre_pdf(pdf_path)}\n  ⚠ Omitido: {motivo}\n"
+    return (None, None, None), salida, metricas_pdf, 'omitido', motivo
+
+def memoria_proceso_mb(pid=None):
+    """Memoria residente de un proceso (por defecto, el actual) en MB.
+
+    Se lee de /proc, así que solo está disponible en Linux; en el resto devuelve None.
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def _bucle_trabajador_limitado(conexion):
+    """Bucle de un TrabajadorLimitado: por cada tarea (funcion, argumentos) que
+    recibe responde primero ('inicio', memoria en uso) y al terminar
+    ('fin', funcion(*argumentos)), o ('error', excepción) si falla"""
+    import signal
+
+    # Ctrl+C lo gestiona el proceso principal, que mata a los trabajadores
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Las importaciones no cuentan para los límites del primer PDF
+    precargar_motor()
+    while True:
+        try:
+            tarea = conexion.recv()
+        except EOFError:
+            return
+        if tarea is None:
+            return
+        funcion, argumentos = tarea
+        conexion.send(('inicio', memoria_proceso_mb()))
+        try:
+            conexion.send(('fin', funcion(*argumentos)))
+        except MemoryError:
+            # También puede faltar memoria al preparar el resultado para enviarlo
+            conexion.send(('sin_memoria', None))
+        except Exception as e:
+            conexion.send(('error', e))
+
+class TrabajadorLimitado:
+    """Proceso de un PoolLimitado, que atiende las tareas de una en una.
+
+    A diferencia de los de ProcessPoolExecutor, se puede matar en mitad de un
+    PDF sin afectar a los demás trabajadores. El tiempo y la memoria de cada
+    tarea se cuentan desde que el trabajador empieza con ella.
+    """
+
+    def __init__(self, contexto):
+        self.conexion, extremo = contexto.Pipe()
+        self.proceso = contexto.Process(target=_bucle_trabajador_limitado, args=(extremo,),
+                                        daemon=True)
+        self.proceso.start()
+        extremo.close()
+        self.tarea = None
+        self.inicio = None
+        self.memoria_inicial = None
+
+    def asignar(self, futuro, funcion, argumentos):
+        """Envía una tarea al trabajador: llamar a funcion(*argumentos) y
+        dejar el resultado en futuro"""
+        self.tarea = futuro
+        self.inicio = None
+        self.memoria_inicial = None
+        self.conexion.send((funcion, argumentos))
+
+    def empezar(self, memoria):
+        """Anota que el trabajador ha empezado con la tarea y la memoria que usaba entonces"""
+        self.inicio = time.monotonic()
+        self.memoria_inicial = memoria
+
+    def exceso(self, limite_segundos=None, limite_memoria_mb=None):
+        """Motivo por el que hay que matar al trabajador (tiempo o memoria), o None"""
+        if self.inicio is None:
+            return None
+        if limite_segundos and time.monotonic() - self.inicio >= limite_segundos:
+            return f"tardó más de {limite_segundos:g} s"
+        if limite_memoria_mb and self.memoria_inicial is not None:
+            memoria = memoria_proceso_mb(self.proceso.pid)
+            if memoria is not None and memoria - self.memoria_inicial > limite_memoria_mb:
+                return f"necesitó más de {limite_memoria_mb:g} MB de memoria"
+        return None
+
+    def terminar(self):
+        """Mata el proceso y cierra la conexión"""
+        if self.proceso.is_alive():
+            self.proceso.kill()
+        self.proceso.join()
+        self.conexion.close()
+
+# Cada cuánto se comprueba la memoria de los trabajadores con --limite-memoria-mb
+INTERVALO_MEMORIA = 0.05
+
+class PoolLimitado:
+    """Pool de trabajadores que se matan si una tarea supera los límites.
+
+    Se usa como un ProcessPoolExecutor (submit() y shutdown()) y, como él, se
+    puede crear una vez y reutilizar en todas las llamadas a procesar_pdfs()
+    (modos --lote, --vigilar y --servir); sus trabajadores solo se sustituyen
+    cuando se mata alguno. Si una tarea tarda más de limites['segundos'] o
+    hace crecer la memoria de su trabajador en más de limites['memoria_mb'],
+    se mata el trabajador y su futuro falla con LimiteSuperado (con los
+    segundos que llevaba); así ningún PDF puede alargar la ejecución más de lo
+    que permiten los límites. La memoria solo se puede vigilar en Linux.
+    """
+
+    def __init__(self, procesos, limites):
+        import collections
+        import multiprocessing
+        import threading
+
+        self.procesos = max(1, procesos or 1)
+        self.limite_segundos = limites.get('segundos')
+        self.limite_memoria = limites.get('memoria_mb')
+        self._contexto = contexto_procesos()
+        self._pendientes = collections.deque()
+        self._cerrojo = threading.Lock()
+        self._cerrando = False
+        self._avisado = False
+        # Para despertar al hilo que reparte cuando llegan tareas nuevas
+        self._aviso, self._avisar = multiprocessing.Pipe(duplex=False)
+        self._hilo = threading.Thread(target=self._repartir, daemon=True)
+        self._hilo.start()
+
+    def submit(self, funcion, *argumentos):
+        """Encola la llamada funcion(*argumentos) y devuelve su Future"""
+        from concurrent.futures import Future
+
+        futuro = Future()
+        with self._cerrojo:
+            if self._cerrando:
+                raise RuntimeError("el pool ya está cerrado")
+            self._pendientes.append((futuro, funcion, argumentos))
+            self._despertar()
+        return futuro
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """Cierra el pool cuando terminen las tareas encoladas (o cancelándolas)"""
+        with self._cerrojo:
+            self._cerrando = True
+            if cancel_futures:
+                for futuro, _, _ in self._pendientes:
+                    futuro.cancel()
+            self._despertar()
+        if wait:
+            self._hilo.join()
+
+    def _despertar(self):
+        """Avisa al hilo que reparte (con el cerrojo cogido)"""
+        if not self._avisado:
+            self._avisado = True
+            self._avisar.send_bytes(b'')
+
+    def _repartir(self):
+        """Hilo que asigna las tareas a los trabajadores, recoge sus respuestas y
+        mata a los que superan los límites"""
+        from multiprocessing.connection import wait
+
+        libres = []
+        ocupados = {}
+        try:
+            while True:
+                with self._cerrojo:
+                    asignar = []
+                    while self._pendientes and len(asignar) < self.procesos - len(ocupados):
+                        tarea = self._pendientes.popleft()
+                        if tarea[0].set_running_or_notify_cancel():
+                            asignar.append(tarea)
+                    if self._cerrando and not asignar and not ocupados:
+                        return
+                for futuro, funcion, argumentos in asignar:
+                    trabajador = libres.pop() if libres else TrabajadorLimitado(self._contexto)
+                    trabajador.asignar(futuro, funcion, argumentos)
+                    ocupados[trabajador.conexion] = trabajador
+
+                # Esperar una respuesta o una tarea nueva, hasta el primer plazo
+                # que venza o hasta la siguiente comprobación de la memoria
+                esperas = [trabajador.inicio + self.limite_segundos - time.monotonic()
+                           for trabajador in ocupados.values()
+                           if self.limite_segundos and trabajador.inicio is not None]
+                if self.limite_memoria and ocupados:
+                    esperas.append(INTERVALO_MEMORIA)
+                espera = max(0.0, min(esperas)) if esperas else None
+                for conexion in wait(list(ocupados) + [self._aviso], espera):
+                    if conexion is self._aviso:
+                        with self._cerrojo:
+                            self._aviso.recv_bytes()
+                            self._avisado = False
+                        continue
+                    trabajador = ocupados[conexion]
+                    try:
+                        tipo, datos = conexion.recv()
+                    except (EOFError, OSError):
+                        # El proceso ha muerto (por ejemplo, el sistema lo ha matado por falta de memoria)
+                        del ocupados[conexion]
+                        trabajador.terminar()
+                        trabajador.tarea.set_exception(LimiteSuperado(
+                            "el proceso que lo leía terminó de forma inesperada"))
+                        continue
+                    if tipo == 'inicio':
+                        trabajador.empezar(datos)
+                        continue
+                    del ocupados[conexion]
+                    libres.append(trabajador)
+                    if tipo == 'fin':
+                        trabajador.tarea.set_result(datos)
+                    elif tipo == 'sin_memoria':
+                        trabajador.tarea.set_exception(MemoryError())
+                    else:
+                        trabajador.tarea.set_exception(datos)
+
+                for conexion, trabajador in list(ocupados.items()):
+                    motivo = trabajador.exceso(self.limite_segundos, self.limite_memoria)
+                    if motivo:
+                        del ocupados[conexion]
+                        trabajador.terminar()
+                        trabajador.tarea.set_exception(
+                            LimiteSuperado(motivo, time.monotonic() - trabajador.inicio))
+        finally:
+            for trabajador in libres + list(ocupados.values()):
+                trabajador.terminar()
+            with self._cerrojo:
+                self._cerrando = True
+                for futuro, _, _ in self._pendientes:
+                    if futuro.set_running_or_notify_cancel():
+                        futuro.set_exception(RuntimeError("el pool se ha cerrado"))
+                self._pendientes.clear()
+            for trabajador in ocupados.values():
+                if not trabajador.tarea.done():
+                    trabajador.tarea.set_exception(RuntimeError("el pool se ha cerrado"))
+
+def contexto_procesos():
+    """Contexto de multiprocessing para crear los procesos trabajadores.
+
+    Se usa forkserver (o spawn donde no existe) en lugar de fork: el proceso
+    principal tiene otros hilos (los del servidor de --servir, el que reparte
+    las tareas de PoolLimitado) y un fork copiaría sus cerrojos a medias. El
+    servidor de procesos ya tiene importados este módulo y el motor, así que
+    cada trabajador nuevo arranca casi tan rápido como con fork.
+    """
+    import multiprocessing
+
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    contexto = multiprocessing.get_context('forkserver')
+    contexto.set_forkserver_preload([__name__, 'pdfplumber'])
+    return contexto
+
+def crear_pool(procesos=None, limites=None):
+    """Pool de procesos para procesar_pdfs(): un PoolLimitado si hay límites por
+    PDF, un ProcessPoolExecutor si hay varios procesos y None si no hace falta.
+
+    Sus trabajadores importan el motor de extracción al arrancar, no con el primer PDF.
+    """
+    if limites:
+        return PoolLimitado(procesos, limites)
+    if procesos and procesos > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(max_workers=procesos, mp_context=contexto_procesos(),
+                                   initializer=precargar_motor)
+    return None
+
+def hash_pdf(pdf_path):
+    """Calcula el hash SHA-256 del contenido de un PDF.
+
+    Un MiembroZip se lee del ZIP (procesar_pdfs() lo lee una sola vez para el
+    hash y para procesarlo); un objeto tipo archivo se lee desde el principio
+    y se deja al principio.
+    """
+    if isinstance(pdf_path, MiembroZip):
+        pdf_path = pdf_path.abrir()
+    h = hashlib.sha256()
+    es_archivo = hasattr(pdf_path, 'read')
+    with contextlib.nullcontext(pdf_path) if es_archivo else open(pdf_path, 'rb') as f:
+        if es_archivo:
+            f.seek(0)
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloque)
+        if es_archivo:
+            f.seek(0)
+    return h.hexdigest()
+
+def leer_cache(directorio_cache, clave):
+    """Devuelve (materia, periodo, datos) guardados para un PDF, o None si no están en caché"""
+    ruta = Path(directorio_cache) / f"{clave}.json"
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            entrada = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if entrada.get('version') != VERSION_CACHE:
+        # Entrada generada con otras reglas de análisis: descartarla
+        with contextlib.suppress(OSError):
+            ruta.unlink()
+        return None
+
+    # Marcar la entrada como usada recientemente (para la expulsión LRU)
+    with contextlib.suppress(OSError):
+        os.utime(ruta)
+    return entrada['materia'], entrada['periodo'], entrada['datos']
+
+def guardar_cache(directorio_cache, clave, resultado):
+    """Guarda el resultado de procesar_pdf() en la caché"""
+    import threading
+
+    nombre_materia, periodo, datos = resultado
+    directorio = Path(directorio_cache)
+    try:
+        directorio.mkdir(parents=True, exist_ok=True)
+        # Único por proceso e hilo: en --servir varias peticiones pueden guardar el mismo PDF
+        temporal = directorio / f"{clave}.json.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': VERSION_CACHE,
+                'materia': nombre_materia,
+                'periodo': periodo,
+                'datos': datos
+            }, f, ensure_ascii=False)
+        os.replace(temporal, directorio / f"{clave}.json")
+    except OSError as e:
+        print(f"  ⚠ No se pudo guardar en caché: {e}")
+
+def podar_cache(directorio_cache, tamano_maximo_mb=TAMANO_MAXIMO_CACHE_MB):
+    """Elimina las entradas usadas hace más tiempo hasta que la caché quepa en el límite"""
+    try:
+        entradas = [(e.stat().st_mtime, e.stat().st_size, e)
+                    for e in Path(directorio_cache).glob("*.json")]
+    except OSError:
+        return
+
+    total = sum(tamano for _, tamano, _ in entradas)
+    limite = tamano_maximo_mb * 1024 * 1024
+    for _, tamano, entrada in sorted(entradas, key=lambda e: e[0]):
+        if total <= limite:
+            break
+        with contextlib.suppress(OSError):
+            entrada.unlink()
+            total -= tamano
+
+def _firma_archivo(ruta):
+    """[tamaño, fecha de modificación] de un archivo"""
+    estado = Path(ruta).stat()
+    return [estado.st_size, estado.st_mtime_ns]
+
+def firma_ejecucion(pdf_files, archivo_ods, otros_archivos=(), opciones=None):
+    """Firma de las entradas y las salidas de una ejecución, o None si falta algún archivo
+
+    otros_archivos son las salidas adicionales (base de datos, exportaciones) y
+    opciones, las opciones que cambian el contenido del ODS.
+    """
+    try:
+        firma = {
+            'version': [VERSION_CACHE, FORMATO_XML],
+            'ods': _firma_archivo(archivo_ods),
+            'pdfs': {pdf_path.name: _firma_archivo(pdf_path) for pdf_path in pdf_files},
+        }
+        if otros_archivos:
+            firma['otros'] = {str(ruta): _firma_archivo(ruta) for ruta in otros_archivos}
+        if opciones:
+            firma['opciones'] = opciones
+        return firma
+    except OSError:
+        return None
+
+def sin_cambios_desde_ultima_ejecucion(directorio_cache, pdf_files, archivo_ods,
+                                       archivo_estado=ARCHIVO_ESTADO, otros_archivos=(),
+                                       opciones=None):
+    """Si ni los PDFs ni el ODS han cambiado desde la última ejecución completa,
+    devuelve la lista de PDFs que no se pudieron incorporar en ella como
+    [(nombre, motivo)] (vacía si no hubo ninguno); si han cambiado, None.
+    """
+    try:
+        with open(Path(directorio_cache) / archivo_estado, 'r', encoding='utf-8') as f:
+            anterior = json.load(f)
+        fallidos = [tuple(fallido) for fallido in anterior.pop('fallidos', [])]
+    except (OSError, ValueError, AttributeError, TypeError):
+        return None
+    if anterior != firma_ejecucion(pdf_files, archivo_ods, otros_archivos, opciones):
+        return None
+    return fallidos
+
+def guardar_firma_ejecucion(directorio_cache, pdf_files, archivo_ods,
+                            archivo_estado=ARCHIVO_ESTADO, otros_archivos=(), opciones=None,
+                            fallidos=()):
+    """Anota la firma de una ejecución terminada para detectar la próxima vez que no hay nada que hacer
+
+    fallidos son los PDFs que no se pudieron incorporar, como (nombre, motivo),
+    para volver a avisar de ellos aunque no haya nada que hacer.
+    """
+    firma = firma_ejecucion(pdf_files, archivo_ods, otros_archivos, opciones)
+    if firma is None:
+        return
+    if fallidos:
+        firma['fallidos'] = [list(fallido) for fallido in fallidos]
+    with contextlib.suppress(OSError):
+        Path(directorio_cache).mkdir(parents=True, exist_ok=True)
+        with open(Path(directorio_cache) / archivo_estado, 'w', encoding='utf-8') as f:
+            json.dump(firma, f, ensure_ascii=False)
+
+def clave_cache(hash_contenido, motor=MOTOR_POR_DEFECTO):
+    """Clave de la caché de un PDF: su hash, distinguiendo el motor si no es el de referencia"""
+    return hash_contenido if motor == MOTOR_POR_DEFECTO else f"{hash_contenido}.{motor}"
+
+def avisar_repetidos(claves_pdfs):
+    """Avisa de los PDFs que son de la misma materia y período.
+
+    claves_pdfs es {nombre del PDF: (materia, periodo)}. No es un error (se
+    fusionan en orden, como siempre), pero suele indicar un informe duplicado
+    o descargado dos veces con distinto contenido.
+    """
+    grupos = {}
+    for nombre, (nombre_materia, periodo) in claves_pdfs.items():
+        grupos.setdefault((normalizar_nombre_hoja(nombre_materia), periodo), []).append(nombre)
+    repetidos = [(clave, nombres) for clave, nombres in grupos.items() if len(nombres) > 1]
+    if not repetidos:
+        return
+    print("⚠ Hay varios PDFs de la misma materia y período; se fusionan en orden y, "
+          "si un alumno aparece en varios, cuentan los datos del último:")
+    for (hoja, periodo), nombres in repetidos:
+        print(f"  - '{hoja}' ({periodo}): {', '.join(nombres)}")
+    print()
+
+class PdfPendiente:
+    """Un PDF de procesar_pdfs() desde que se prepara en el hilo de lectura hasta que se entrega.
+
+    origen es lo que se procesa (el propio PDF o, si es de un ZIP, su contenido
+    ya leído) y hash, el de su contenido. Si el resultado se conoce sin leerlo
+    (del modelo del ODS o de la caché), resultado y estado lo indican; si no,
+    estado es None y futuro es la tarea del pool que lo está leyendo, si la hay.
+    """
+
+    def __init__(self, pdf, origen, hash_contenido=None, resultado=None, estado=None):
+        self.pdf = pdf
+        self.origen = origen
+        self.hash = hash_contenido
+        self.resultado = resultado
+        self.estado = estado
+        self.futuro = None
+
+def _preparar_pdf(pdf_path, hashes, calcular_hash, incorporados, directorio_cache, motor,
+                  filtrar):
+    """Calcula el hash de un PDF y busca su resultado en el modelo del ODS o en la caché
+
+    Se llama desde el hilo de lectura de procesar_pdfs(), por delante del PDF
+    que se está procesando. Devuelve un PdfPendiente.
+    """
+    hash_contenido = hashes.get(pdf_path)
+    origen = pdf_path
+    try:
+        if isinstance(pdf_path, MiembroZip) and hash_contenido is None:
+            origen = pdf_path.abrir()
+            hash_contenido = hash_pdf(origen)
+        elif hash_contenido is None and calcular_hash:
+            hash_contenido = hash_pdf(pdf_path)
+    except Exception:
+        # Se vuelve a intentar al procesarlo, que es donde se informa del error
+        pass
+    if hash_contenido and clave_cache(hash_contenido, motor) in incorporados:
+        hoja, periodo = incorporados[clave_cache(hash_contenido, motor)]
+        return PdfPendiente(pdf_path, origen, hash_contenido, (hoja, periodo, None), 'incorporado')
+    if hash_contenido and directorio_cache:
+        resultado = leer_cache(directorio_cache, clave_cache(hash_contenido, motor))
+        # Los descartados (sin materia) solo valen si se sigue filtrando
+        if resultado and (resultado[0] or filtrar):
+            return PdfPendiente(pdf_path, origen, hash_contenido, resultado,
+                                'en_cache' if resultado[0] else 'descartado')
+    if origen is pdf_path and isinstance(pdf_path, MiembroZip):
+        with contextlib.suppress(Exception):
+            origen = pdf_path.abrir()
+    return PdfPendiente(pdf_path, origen, hash_contenido)
+
+def _leer_pendiente(pendiente, con_metricas, motor, filtrar):
+    """Lee un PdfPendiente, en serie o esperando a su tarea del pool
+
+    Devuelve lo mismo que _procesar_pdf_capturando(); si el PDF ha superado los
+    límites, como omitido.
+    """
+    if pendiente.futuro is None:
+        metricas_pdf = {} if con_metricas else None
+        resultado, estado, motivo = _procesar_pdf_con_estado(pendiente.origen, metricas_pdf,
+                                                             motor, filtrar=filtrar)
+        return resultado, None, metricas_pdf, estado, motivo
+    try:
+        return pendiente.futuro.result()
+    except (LimiteSuperado, MemoryError) as e:
+        return _omitido(pendiente.pdf, _motivo_omision(e), con_metricas,
+                        getattr(e, 'segundos', 0.0))
+
+def procesar_pdfs(pdf_files, procesos=None, directorio_cache=None, metricas=None,
+                  motor=MOTOR_POR_DEFECTO, executor=None, hashes=None, limites=None,
+                  omitidos=None, filtrar=True, incorporados=None):
+    """Procesa los PDFs en serie o en paralelo y los devuelve en el orden de entrada.
+
+    Genera (pdf, (materia, periodo, datos), estado) por cada PDF, con estado
+    'leido', 'en_cache', 'incorporado' (ver incorporados), 'error' (no se
+    pudo leer o no tiene datos), 'descartado' (no es un informe) u 'omitido'
+    (ha superado los límites).
+
+    Con procesos=None (o 1) se procesan uno a uno. Con más procesos, la extracción
+    y el análisis se reparten en un pool, pero los resultados (y sus mensajes) se
+    entregan siempre en el mismo orden que pdf_files, de modo que la fusión
+    posterior es idéntica a la de una ejecución en serie. Si se pasa executor, se
+    usa ese pool (sin cerrarlo) en lugar de crear uno.
+
+    Los PDFs se leen en un hilo por delante del que se está procesando: ahí se
+    calcula su hash (una sola vez, también el de los PDFs de un ZIP, que se
+    descomprimen una sola vez) y se decide si hace falta procesarlos. hashes
+    es un diccionario {pdf: hash_pdf(pdf)} con los ya calculados, al que se
+    añaden los nuevos. Los PDFs que están en incorporados ({clave_cache(hash,
+    motor): [hoja, periodo]}, el modelo del ODS) se dan como 'incorporados' sin
+    leerlos, con datos None: solo los que se leyeron con el mismo motor.
+
+    Con filtrar, de cada PDF se mira primero su primera página y los que no son
+    informes de Raíces (circulares, horarios, escaneos...) se descartan sin
+    leer el resto (ver procesar_pdf()). Al terminar se avisa de los PDFs que
+    son de la misma materia y período que otro, incluidos los incorporados.
+
+    Si se indica directorio_cache, los PDFs cuyo contenido ya se analizó en una
+    ejecución anterior se toman de la caché sin volver a analizarlos, también
+    los que se descartaron por no ser informes. Las entradas de cada motor de
+    extracción se guardan por separado.
+    Con limites ({'segundos', 'paginas', 'memoria_mb'}, ver PoolLimitado) cada
+    PDF se procesa en un trabajador que se puede matar; los PDFs que los
+    superan se dan como fallidos y se añaden a la lista omitidos como
+    (nombre, motivo). En ese caso, el executor que se pase debe ser un
+    PoolLimitado (ver crear_pool()).
+    Con metricas, se añade a metricas.pdfs un registro por cada PDF.
+    """
+    import collections
+
+    con_metricas = metricas is not None
+    calcular_hash = hashes is not None or bool(directorio_cache or incorporados)
+    hashes = {} if hashes is None else hashes
+    preparar = functools.partial(_preparar_pdf, hashes=hashes, calcular_hash=calcular_hash,
+                                 incorporados=incorporados or {},
+                                 directorio_cache=directorio_cache, motor=motor, filtrar=filtrar)
+
+    # Sin pool propio, con -j el primer PDF que hay que leer espera al segundo:
+    # si no lo hay, se lee en serie sin arrancar el pool
+    paralelo = executor is not None or bool(limites) or bool(procesos and procesos > 1
+                                                            and len(pdf_files) > 1)
+    adelanto = 2 * max(1, procesos or 1) if paralelo else 0
+    tarea = functools.partial(_procesar_pdf_capturando, con_metricas=con_metricas, motor=motor,
+                              limite_paginas=(limites or {}).get('paginas'), filtrar=filtrar)
+    pool_propio = False
+    en_espera = None
+
+    def enviar(pendiente):
+        nonlocal executor, pool_propio
+        if executor is None:
+            executor = crear_pool(min(procesos or 1, len(pdf_files)), limites)
+            pool_propio = True
+        pendiente.futuro = executor.submit(tarea, pendiente.origen)
+
+    claves_pdfs = {}
+
+    def entregar(pendiente):
+        nonlocal en_espera
+        if pendiente is en_espera:
+            en_espera = None
+        pdf_path = pendiente.pdf
+        if pendiente.estado == 'incorporado':
+            claves_pdfs[nombre_pdf(pdf_path)] = pendiente.resultado[:2]
+            return pdf_path, pendiente.resultado, pendiente.estado
+        if pendiente.estado is not None:
+            nombre_materia, periodo, datos = pendiente.resultado
+            print(f"Procesando: {nombre_pdf(pdf_path)}")
+            if con_metricas:
+                metricas.pdfs.append({'archivo': nombre_pdf(pdf_path), 'en_cache': True,
+                                      'filas': len(datos)})
+            if pendiente.estado == 'descartado':
+                print("  ⚠ No es un informe de faltas de Raíces (en caché): se descarta")
+                return pdf_path, (None, None, None), pendiente.estado
+            print(f"  ✓ Materia: '{nombre_materia}' - Período: '{periodo}' ({len(datos)} alumnos, en caché)")
+            claves_pdfs[nombre_pdf(pdf_path)] = (nombre_materia, periodo)
+            return pdf_path, pendiente.resultado, pendiente.estado
+
+        resultado, salida, metricas_pdf, estado, motivo = _leer_pendiente(
+            pendiente, con_metricas, motor, filtrar)
+        if salida is not None:
+            print(salida, end='')
+        if estado == 'omitido' and omitidos is not None:
+            omitidos.append((nombre_pdf(pdf_path), motivo))
+        if con_metricas:
+            metricas_pdf.update(archivo=nombre_pdf(pdf_path), en_cache=False, correcto=all(resultado))
+            if estado in ('omitido', 'descartado'):
+                metricas_pdf[estado] = motivo or True
+            metricas.pdfs.append(metricas_pdf)
+        if estado == 'leido':
+            claves_pdfs[nombre_pdf(pdf_path)] = resultado[:2]
+        if directorio_cache and pendiente.hash and estado in ('leido', 'descartado'):
+            guardar_cache(directorio_cache, clave_cache(pendiente.hash, motor),
+                          resultado if estado == 'leido' else (None, None, []))
+        return pdf_path, resultado, estado
+
+    en_curso = collections.deque()
+    try:
+        with contextlib.closing(leer_por_adelantado(pdf_files, preparar,
+                                                    max(1, adelanto))) as preparados:
+            for pendiente in preparados:
+                if pendiente.hash:
+                    hashes[pendiente.pdf] = pendiente.hash
+                if pendiente.estado is None and paralelo:
+                    if executor is None and not limites and en_espera is None:
+                        en_espera = pendiente
+                    else:
+                        if en_espera is not None:
+                            enviar(en_espera)
+                            en_espera = None
+                        enviar(pendiente)
+                en_curso.append(pendiente)
+                while len(en_curso) > adelanto:
+                    yield entregar(en_curso.popleft())
+        while en_curso:
+            yield entregar(en_curso.popleft())
+        avisar_repetidos(claves_pdfs)
+    finally:
+        for pendiente in en_curso:
+            if pendiente.futuro is not None:
+                pendiente.futuro.cancel()
+        if pool_propio:
+            executor.shutdown()
+
+def pdfs_a_releer(ya_incorporados, resultados):
+    """PDFs incorporados que hay que volver a leer para fusionarlos en orden.
+
+    ya_incorporados es {pdf: (hoja, periodo)} de los que procesar_pdfs() no
+    leyó y resultados, {pdf: (materia, periodo, datos)} de los leídos. Un PDF
+    leído de la misma hoja y período que uno incorporado obliga a leer también
+    este, para que la fusión sea la misma que si se leyeran todos.
+    """
+    claves_nuevas = {(normalizar_nombre_hoja(nombre_materia), periodo)
+                     for nombre_materia, periodo, _ in resultados.values()}
+    return [pdf_path for pdf_path, clave in ya_incorporados.items()
+            if tuple(clave) in claves_nuevas]
+
+def anotar_incorporados(pdfs_fusionados, nuevos):
+    """Añade al modelo del ODS ({clave: [hoja, periodo]}) los PDFs recién fusionados
+
+    Al fusionar un PDF sobrescribe los datos de su hoja y período, así que los
+    que el modelo tenía para esa hoja y período (y no están entre los nuevos)
+    dejan de estar incorporados: si vuelven, hay que leerlos de nuevo.
+    """
+    claves = {tuple(clave) for clave in nuevos.values()}
+    for huella in [huella for huella, clave in pdfs_fusionados.items()
+                   if tuple(clave) in claves and huella not in nuevos]:
+        del pdfs_fusionados[huella]
+    pdfs_fusionados.update(nuevos)
+
 def normalizar_nombre_hoja(nombre):
     """Normaliza el nombre de una hoja truncándolo a 31 caracteres (límite de ODS)"""
     if nombre is None:
@@ -132,8 +1241,94 @@ def escape_xml(text):
     text = text.replace("'", "&apos;")
     return text
 
+# Espacios de nombres de OpenDocument usados en content.xml
+NS_OFFICE = "urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+NS_TABLE = "urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+NS_TEXT = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+# Espacio de nombres de las fórmulas OpenFormula (prefijo of: en table:formula)
+NS_FORMULA = "urn:oasis:names:tc:opendocument:xmlns:of:1.2"
+
+TAG_TABLA = "{%s}table" % NS_TABLE
+TAG_FILA = "{%s}table-row" % NS_TABLE
+TAG_CELDA = "{%s}table-cell" % NS_TABLE
+TAG_CELDA_CUBIERTA = "{%s}covered-table-cell" % NS_TABLE
+ATR_NOMBRE_TABLA = "{%s}name" % NS_TABLE
+ATR_COLUMNAS_REPETIDAS = "{%s}number-columns-repeated" % NS_TABLE
+ATR_VALOR = "{%s}value" % NS_OFFICE
+
+# Versión del XML que genera crear_ods(). Se anota en content.xml para reutilizar
+# las hojas sin cambios solo si se escribieron con el mismo formato; incrementarla
+# al cambiar cómo se escriben las hojas.
+FORMATO_XML = 3
+
+ENCABEZADO_CONTENT = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    f'<!--generar_faltas_ods formato {FORMATO_XML}-->\n'
+    f'<office:document-content xmlns:office="{NS_OFFICE}" '
+    f'xmlns:table="{NS_TABLE}" xmlns:text="{NS_TEXT}" xmlns:of="{NS_FORMULA}" '
+    'office:version="1.2">'
+)
+
+MANIFEST_ODS = '''<?xml version="1.0" encoding="UTF-8"?>
+<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0">
+  <manifest:file-entry manifest:media-type="application/vnd.oasis.opendocument.spreadsheet" manifest:full-path="/"/>
+  <manifest:file-entry manifest:media-type="text/xml" manifest:full-path="content.xml"/>
+  <manifest:file-entry manifest:media-type="application/json" manifest:full-path="modelo_faltas.json"/>
+</manifest:manifest>'''
+
+# Copia del modelo (materias, períodos, recuentos y PDFs fusionados) que crear_ods()
+# guarda dentro del ODS para no tener que volver a analizar content.xml. Lleva la
+# huella del content.xml con el que se escribió: si no coincide (hoja editada a
+# mano), se ignora. Incrementar FORMATO_MODELO al cambiar su estructura.
+ARCHIVO_MODELO = "modelo_faltas.json"
+FORMATO_MODELO = 1
+
+def _texto_celda(cell):
+    """Texto visible de una celda, con los espacios normalizados como en OpenDocument.
+
+    Tiene en cuenta los estilos anidados (text:span) que añade LibreOffice y los
+    saltos de línea y sangrías que metía el formateo de versiones anteriores.
+    """
+    texto = ' '.join(
+        ''.join(p.itertext()) for p in cell.iter('{%s}p' % NS_TEXT))
+    return ' '.join(texto.split())
+
+def _celdas_fila(row):
+    """Genera las celdas de una fila expandiendo table:number-columns-repeated"""
+    for cell in row:
+        if cell.tag not in (TAG_CELDA, TAG_CELDA_CUBIERTA):
+            continue
+        repeticiones = int(cell.get(ATR_COLUMNAS_REPETIDAS, 1))
+        for _ in range(repeticiones):
+            yield cell
+
+def _cabeceras_fila(row):
+    """Lee la fila de cabecera, excluyendo las columnas TOTAL y las celdas vacías finales"""
+    cabeceras = []
+    vacias_pendientes = 0
+    for cell in row:
+        if cell.tag not in (TAG_CELDA, TAG_CELDA_CUBIERTA):
+            continue
+        texto = _texto_celda(cell)
+        if not texto:
+            # Las celdas vacías solo cuentan si les sigue alguna cabecera
+            # (LibreOffice rellena el final de la fila con miles de celdas repetidas)
+            vacias_pendientes += int(cell.get(ATR_COLUMNAS_REPETIDAS, 1))
+            continue
+        cabeceras.extend([""] * vacias_pendientes)
+        vacias_pendientes = 0
+        # Filtrar columnas TOTAL - serán regeneradas automáticamente
+        if 'TOTAL' not in texto:
+            cabeceras.append(texto)
+    return cabeceras
+
 def leer_ods_existente(filename):
-    """Lee un archivo ODS existente y extrae su estructura"""
+    """Lee un archivo ODS existente y extrae su estructura
+
+    Recorre content.xml en streaming (iterparse): procesa una fila cada vez y la
+    libera después, de modo que la memoria no depende del tamaño del archivo.
+    """
+    import zipfile
     from xml.etree import ElementTree as ET
 
     if not Path(filename).exists():
@@ -142,89 +1337,61 @@ def leer_ods_existente(filename):
     try:
         hojas_existentes = {}
 
-        with zipfile.ZipFile(filename, 'r') as zf:
-            content_xml = zf.read('content.xml')
-            root = ET.fromstring(content_xml)
-
-            # Namespaces
-            ns = {
-                'office': 'urn:oasis:names:tc:opendocument:xmlns:office:1.0',
-                'table': 'urn:oasis:names:tc:opendocument:xmlns:table:1.0',
-                'text': 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
-            }
-
-            # Buscar todas las tablas (hojas)
-            tables = root.findall('.//table:table', ns)
-
-            for table in tables:
-                nombre_hoja = normalizar_nombre_hoja(table.get('{%s}name' % ns['table']))
-                rows = table.findall('.//table:table-row', ns)
-
-                if not rows:
+        with zipfile.ZipFile(filename, 'r') as zf, zf.open('content.xml') as content_xml:
+            nombre_hoja = None
+            cabeceras = None
+            alumnos = {}
+
+            for evento, elem in ET.iterparse(content_xml, events=('start', 'end')):
+                if evento == 'start':
+                    if elem.tag == TAG_TABLA:
+                        # Nueva hoja (la de resumen no tiene datos propios: se salta)
+                        nombre_hoja = normalizar_nombre_hoja(elem.get(ATR_NOMBRE_TABLA))
+                        if nombre_hoja == NOMBRE_HOJA_RESUMEN:
+                            nombre_hoja = None
+                        cabeceras = None
+                        alumnos = {}
                     continue
 
-                # Primera fila: cabeceras (excluyendo columnas TOTAL)
-                header_row = rows[0]
-                cabeceras = []
-                for cell in header_row.findall('.//table:table-cell', ns):
-                    text_elem = cell.find('.//text:p', ns)
-                    if text_elem is not None and text_elem.text:
-                        # Filtrar columnas TOTAL - serán regeneradas automáticamente
-                        if 'TOTAL' not in text_elem.text:
-                            cabeceras.append(text_elem.text)
+                if elem.tag == TAG_FILA and nombre_hoja is not None:
+                    if cabeceras is None:
+                        # Primera fila: cabeceras (excluyendo columnas TOTAL)
+                        cabeceras = _cabeceras_fila(elem)
                     else:
-                        cabeceras.append("")
-
-                # Extraer períodos de las cabeceras
-                periodos = []
-                for cabecera in cabeceras:
-                    # Buscar patrón (DD/MM/YYYY - DD/MM/YYYY)
-                    match = re.search(r'\((\d{2}/\d{2}/\d{4}\s*-\s*\d{2}/\d{2}/\d{4})\)', cabecera)
-                    if match and match.group(1) not in periodos:
-                        periodos.append(match.group(1))
-
-                # Resto de filas: datos de alumnos
-                alumnos = {}
-                for row in rows[1:]:
-                    cells = row.findall('.//table:table-cell', ns)
-                    if not cells:
-                        continue
-
-                    # Primera celda: nombre del alumno
-                    nombre_cell = cells[0].find('.//text:p', ns)
-                    if nombre_cell is None or not nombre_cell.text:
-                        continue
-
-                    nombre_alumno = nombre_cell.text
-                    valores = []
-
-                    # Resto de celdas: leer solo las que corresponden a cabeceras (sin TOTAL)
-                    # Las cabeceras ya tienen filtradas las columnas TOTAL
-                    # Entonces solo leemos len(cabeceras)-1 celdas (excluyendo la primera que es el nombre)
-                    num_celdas_a_leer = len(cabeceras) - 1  # -1 porque cabeceras incluye "Alumno/a"
-
-                    for idx in range(num_celdas_a_leer):
-                        if idx + 1 < len(cells):
-                            cell = cells[idx + 1]  # +1 para saltar la celda del nombre
-                            value = cell.get('{%s}value' % ns['office'])
-                            if value is not None:
-                                valores.append(value)
-                            else:
-                                text_elem = cell.find('.//text:p', ns)
-                                if text_elem is not None and text_elem.text:
-                                    valores.append(text_elem.text)
-                                else:
-                                    valores.append("")
-                        else:
-                            valores.append("")
-
-                    alumnos[nombre_alumno] = valores
-
-                hojas_existentes[nombre_hoja] = {
-                    'cabeceras': cabeceras,
-                    'periodos': periodos,
-                    'alumnos': alumnos
-                }
+                        # Resto de filas: datos de alumnos
+                        celdas = _celdas_fila(elem)
+                        primera = next(celdas, None)
+                        nombre_alumno = _texto_celda(primera) if primera is not None else ""
+
+                        if nombre_alumno:
+                            # Leer solo las celdas que corresponden a cabeceras (sin TOTAL)
+                            # -1 porque cabeceras incluye "Alumno/a"
+                            valores = []
+                            for _, cell in zip(range(len(cabeceras) - 1), celdas):
+                                value = cell.get(ATR_VALOR)
+                                valores.append(value if value is not None else _texto_celda(cell))
+                            valores.extend([""] * (len(cabeceras) - 1 - len(valores)))
+                            alumnos[nombre_alumno] = valores
+
+                    elem.clear()
+
+                elif elem.tag == TAG_TABLA:
+                    if cabeceras is not None:
+                        # Extraer períodos de las cabeceras
+                        periodos = []
+                        for cabecera in cabeceras:
+                            # Buscar patrón (DD/MM/YYYY - DD/MM/YYYY)
+                            match = re.search(r'\((\d{2}/\d{2}/\d{4}\s*-\s*\d{2}/\d{2}/\d{4})\)', cabecera)
+                            if match and match.group(1) not in periodos:
+                                periodos.append(match.group(1))
+
+                        hojas_existentes[nombre_hoja] = {
+                            'cabeceras': cabeceras,
+                            'periodos': periodos,
+                            'alumnos': alumnos
+                        }
+                    nombre_hoja = None
+                    elem.clear()
 
         return hojas_existentes
 
@@ -232,334 +1399,966 @@ def leer_ods_existente(filename):
         print(f"⚠ Error al leer ODS existente: {e}")
         return None
 
-def fusionar_datos_hoja(hoja_existente, periodo_nuevo, datos_nuevos):
-    """Fusiona datos nuevos con una hoja existente - AGRUPADO POR TIPO"""
+# Tipos de falta, en el orden en que se agrupan las columnas de cada hoja
+TIPOS_FALTA = ('Justificadas', 'Injustificadas', 'Retrasos')
 
-    # Si no existe hoja, crear estructura nueva
-    if hoja_existente is None:
-        cabeceras = [
-            'Alumno/a',
-            f'Justificadas ({periodo_nuevo})',
-            f'Injustificadas ({periodo_nuevo})',
-            f'Retrasos ({periodo_nuevo})'
-            # Las columnas TOTAL se añaden automáticamente en crear_ods()
-        ]
-        alumnos = {}
-        for nombre, fj, fi, r in datos_nuevos:
-            # Estructura: [just(p1), inj(p1), ret(p1)]
-            alumnos[nombre] = [fj, fi, r]
+def _a_numero(valor):
+    """Convierte un recuento leído del PDF o del ODS en número (None si está vacío)"""
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, (int, float)):
+        return valor
+    try:
+        return int(valor)
+    except ValueError:
+        try:
+            numero = float(valor)
+        except ValueError:
+            return None
+        return int(numero) if numero == int(numero) else numero
+
+class HojaFaltas:
+    """Modelo interno de una hoja: un bloque de columnas por período.
+
+    Cada período guarda tres columnas (Justificadas, Injustificadas, Retrasos)
+    con los recuentos indexados por la posición del alumno en la hoja. Añadir o
+    sobrescribir un período solo toca las filas del PDF nuevo; la disposición
+    agrupada por tipo de crear_ods() se genera únicamente al escribir.
+
+    modificada indica si la hoja cambió desde que se leyó del ODS. Mientras no
+    cambie, crear_ods() copia tal cual su XML original (xml_original) en vez de
+    volver a generarlo.
+    """
+
+    def __init__(self):
+        self.periodos = []
+        self.alumnos = []
+        self._posiciones = {}
+        self.bloques = {}
+        self.modificada = True
+        self.xml_original = None
+
+    @classmethod
+    def desde_tabla(cls, hoja, xml_original=None):
+        """Crea el modelo a partir de la estructura que devuelve leer_ods_existente()
+
+        xml_original es el XML de la hoja en el ODS del que se leyó, si se puede
+        reutilizar (ver leer_xml_hojas()).
+        """
+        modelo = cls()
+        columnas = []
+        for cabecera in hoja['cabeceras'][1:]:
+            match = re.match(r'(%s) \((.+)\)$' % '|'.join(TIPOS_FALTA), cabecera)
+            columnas.append((match.group(1), match.group(2)) if match else None)
+
+        for periodo in hoja['periodos']:
+            modelo._bloque(periodo)
+
+        for nombre, valores in hoja['alumnos'].items():
+            pos = modelo._posicion(nombre)
+            for columna, valor in zip(columnas, valores):
+                if columna is not None and columna[1] in modelo.bloques:
+                    tipo, periodo = columna
+                    _fijar_valor(modelo.bloques[periodo][tipo], pos, _a_numero(valor))
+
+        modelo.modificada = False
+        modelo.xml_original = xml_original
+        return modelo
+
+    @classmethod
+    def desde_modelo(cls, hoja, xml_original=None):
+        """Crea el modelo a partir de una hoja del modelo guardado en el ODS (ver a_modelo())"""
+        modelo = cls()
+        for nombre in hoja['alumnos']:
+            modelo._posicion(nombre)
+        for periodo, columnas in zip(hoja['periodos'], hoja['recuentos']):
+            bloque = modelo._bloque(periodo)
+            for tipo, columna in zip(TIPOS_FALTA, columnas):
+                bloque[tipo] = list(columna)
+
+        modelo.modificada = False
+        modelo.xml_original = xml_original
+        return modelo
+
+    def a_modelo(self, nombre):
+        """Estructura serializable en JSON de la hoja, tal como se guarda en el ODS"""
+        return {
+            'nombre': nombre,
+            'periodos': list(self.periodos),
+            'alumnos': list(self.alumnos),
+            'recuentos': [[self.bloques[periodo][tipo] for tipo in TIPOS_FALTA]
+                          for periodo in self.periodos],
+        }
 
+    def _marcar_modificada(self):
+        """Anota que la hoja ha cambiado y su XML original ya no sirve"""
+        self.modificada = True
+        self.xml_original = None
+
+    def _posicion(self, nombre):
+        """Posición del alumno en la hoja, añadiéndolo al final si es nuevo"""
+        pos = self._posiciones.get(nombre)
+        if pos is None:
+            pos = len(self.alumnos)
+            self._posiciones[nombre] = pos
+            self.alumnos.append(nombre)
+        return pos
+
+    def _bloque(self, periodo):
+        """Columnas de un período, creándolas vacías si el período es nuevo"""
+        bloque = self.bloques.get(periodo)
+        if bloque is None:
+            bloque = {tipo: [] for tipo in TIPOS_FALTA}
+            self.bloques[periodo] = bloque
+            self.periodos.append(periodo)
+        return bloque
+
+    def fijar_periodo(self, periodo, datos):
+        """Añade un período o sobrescribe sus valores con las filas [nombre, fj, fi, r]
+
+        Si los datos coinciden con los que ya tenía la hoja, no se marca como modificada.
+        """
+        cambios = periodo not in self.bloques
+        bloque = self._bloque(periodo)
+        for nombre, fj, fi, r in datos:
+            cambios |= nombre not in self._posiciones
+            pos = self._posicion(nombre)
+            for tipo, valor in zip(TIPOS_FALTA, (fj, fi, r)):
+                cambios |= _fijar_valor(bloque[tipo], pos, _a_numero(valor))
+        if cambios:
+            self._marcar_modificada()
+
+    def ordenar_periodos(self):
+        """Ordena los bloques de columnas cronológicamente"""
+        ordenados = sorted(self.periodos, key=clave_periodo)
+        if ordenados != self.periodos:
+            self.periodos = ordenados
+            self._marcar_modificada()
+
+    def valor(self, periodo, tipo, pos):
+        """Recuento de un alumno en un período (None si está vacío)"""
+        columna = self.bloques[periodo][tipo]
+        return columna[pos] if pos < len(columna) else None
+
+    def cabeceras(self):
+        """Cabeceras agrupadas por tipo (sin las columnas TOTAL)"""
+        cabeceras = ['Alumno/a']
+        for tipo in TIPOS_FALTA:
+            for periodo in self.periodos:
+                cabeceras.append(f'{tipo} ({periodo})')
+        return cabeceras
+
+    def filas(self):
+        """Genera (nombre, valores) con los valores agrupados por tipo, como en las cabeceras"""
+        columnas = [self.bloques[periodo][tipo]
+                    for tipo in TIPOS_FALTA for periodo in self.periodos]
+        for pos, nombre in enumerate(self.alumnos):
+            yield nombre, [columna[pos] if pos < len(columna) else None
+                           for columna in columnas]
+
+    def a_tabla(self):
+        """Convierte el modelo a la estructura {'cabeceras', 'periodos', 'alumnos'}"""
         return {
-            'cabeceras': cabeceras,
-            'periodos': [periodo_nuevo],
-            'alumnos': alumnos
+            'cabeceras': self.cabeceras(),
+            'periodos': list(self.periodos),
+            'alumnos': {nombre: ["" if v is None else v for v in valores]
+                        for nombre, valores in self.filas()}
         }
 
-    # Hoja existente: fusionar datos
-    cabeceras = list(hoja_existente['cabeceras'])
-    periodos = list(hoja_existente['periodos'])
-    alumnos = dict(hoja_existente['alumnos'])
-
-    # Verificar si el período ya existe
-    periodo_existe = periodo_nuevo in periodos
-    num_periodos = len(periodos)
-
-    if periodo_existe:
-        # Sobrescribir: encontrar posiciones de este período
-        idx_periodo = periodos.index(periodo_nuevo)
-
-        # Posiciones en estructura agrupada por tipo:
-        # Just: índices 0 hasta num_periodos-1
-        # Inj: índices num_periodos hasta 2*num_periodos-1
-        # Ret: índices 2*num_periodos hasta 3*num_periodos-1
-        pos_just = idx_periodo
-        pos_inj = num_periodos + idx_periodo
-        pos_ret = 2 * num_periodos + idx_periodo
-
-        # Actualizar/añadir alumnos
-        for nombre, fj, fi, r in datos_nuevos:
-            if nombre in alumnos:
-                valores = list(alumnos[nombre])
-                while len(valores) < 3 * num_periodos:
-                    valores.append("")
-                valores[pos_just] = fj
-                valores[pos_inj] = fi
-                valores[pos_ret] = r
-                alumnos[nombre] = valores
-            else:
-                # Alumno nuevo
-                valores = [""] * (3 * num_periodos)
-                valores[pos_just] = fj
-                valores[pos_inj] = fi
-                valores[pos_ret] = r
-                alumnos[nombre] = valores
+def _fijar_valor(columna, pos, valor):
+    """Escribe un valor en una columna, rellenando con vacíos hasta su posición.
+
+    Devuelve True si el valor ha cambiado.
+    """
+    if pos >= len(columna):
+        columna.extend([None] * (pos + 1 - len(columna)))
+    if columna[pos] == valor:
+        return False
+    columna[pos] = valor
+    return True
+
+def leer_xml_hojas(filename):
+    """Devuelve {nombre_hoja: XML} de las hojas de un ODS generado por este programa.
+
+    Solo se extrae el XML si content.xml lo escribió crear_ods() con el formato
+    actual (ENCABEZADO_CONTENT); en cualquier otro caso (archivo editado y guardado
+    con LibreOffice, versión anterior...) devuelve un diccionario vacío y las hojas
+    se regenerarán a partir de sus datos.
+    """
+    import zipfile
+
+    try:
+        with zipfile.ZipFile(filename, 'r') as zf:
+            content_xml = zf.read('content.xml').decode('utf-8')
+    except (OSError, KeyError, zipfile.BadZipFile, UnicodeDecodeError):
+        return {}
+
+    return _xml_hojas(content_xml)
+
+def _xml_hojas(content_xml):
+    """{nombre_hoja: XML} de un content.xml escrito por crear_ods() (ver leer_xml_hojas())"""
+    from xml.sax.saxutils import unescape
+
+    if not content_xml.startswith(ENCABEZADO_CONTENT):
+        return {}
+
+    xml_hojas = {}
+    apertura = '<table:table table:name="'
+    cierre = '</table:table>'
+    inicio = content_xml.find(apertura)
+    while inicio != -1:
+        fin_nombre = content_xml.index('"', inicio + len(apertura))
+        fin = content_xml.index(cierre, fin_nombre) + len(cierre)
+        nombre = unescape(content_xml[inicio + len(apertura):fin_nombre],
+                          {'&quot;': '"', '&apos;': "'"})
+        xml_hojas[normalizar_nombre_hoja(nombre)] = content_xml[inicio:fin]
+        inicio = content_xml.find(apertura, fin)
+
+    return xml_hojas
+
+def leer_modelo_ods(filename):
+    """Lee el modelo guardado en el ODS por crear_ods(), si sigue siendo válido.
+
+    Devuelve ({nombre_hoja: HojaFaltas}, XML de la hoja de resumen, PDFs
+    fusionados) o None si el archivo no tiene modelo, es de otro formato o
+    content.xml ha cambiado desde que se escribió (por ejemplo, porque se ha
+    editado y guardado con LibreOffice). Los PDFs fusionados son
+    {clave: [nombre_hoja, periodo]}, con la clave de caché de cada PDF: su hash
+    y el motor con el que se leyó (ver clave_cache()).
+    """
+    import zipfile
+
+    try:
+        with zipfile.ZipFile(filename, 'r') as zf:
+            modelo = json.loads(zf.read(ARCHIVO_MODELO))
+            info = zf.getinfo('content.xml')
+            if (modelo.get('formato') != FORMATO_MODELO
+                    or modelo.get('content') != [info.CRC, info.file_size]):
+                return None
+            content_xml = zf.read('content.xml').decode('utf-8')
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+    xml_hojas = _xml_hojas(content_xml)
+    hojas = {hoja['nombre']: HojaFaltas.desde_modelo(hoja, xml_hojas.get(hoja['nombre']))
+             for hoja in modelo['hojas']}
+    return hojas, xml_hojas.get(NOMBRE_HOJA_RESUMEN), modelo['pdfs']
+
+def fusionar_datos_hoja(hoja_existente, periodo_nuevo, datos_nuevos):
+    """Fusiona datos nuevos con una hoja existente - AGRUPADO POR TIPO
+
+    La hoja existente puede ser un HojaFaltas (se actualiza en el sitio) o la
+    estructura leída de un ODS por leer_ods_existente(). El coste es proporcional
+    a las filas del PDF nuevo, no al tamaño de la hoja.
+    """
+    if hoja_existente is None:
+        hoja = HojaFaltas()
+    elif isinstance(hoja_existente, HojaFaltas):
+        hoja = hoja_existente
     else:
-        # Añadir nuevo período
-        periodos.append(periodo_nuevo)
-        num_periodos_nuevo = len(periodos)
-
-        # Construir nuevas cabeceras agrupadas por tipo
-        nuevas_cabeceras = ['Alumno/a']
-
-        # Añadir todas las Justificadas
-        for p in periodos:
-            nuevas_cabeceras.append(f'Justificadas ({p})')
-
-        # Añadir todas las Injustificadas
-        for p in periodos:
-            nuevas_cabeceras.append(f'Injustificadas ({p})')
-
-        # Añadir todos los Retrasos
-        for p in periodos:
-            nuevas_cabeceras.append(f'Retrasos ({p})')
-
-        # Las columnas TOTAL se añaden automáticamente en crear_ods()
-
-        cabeceras = nuevas_cabeceras
-
-        # Reorganizar datos de alumnos a nueva estructura
-        nuevos_alumnos = {}
-        for nombre, valores_antiguos in alumnos.items():
-            # Reorganizar de estructura antigua a nueva
-            # Antigua (1 período): [just1, inj1, ret1]
-            # Nueva (2 períodos): [just1, just2, inj1, inj2, ret1, ret2]
-
-            # Extraer valores por tipo del formato antiguo
-            justs = []
-            injs = []
-            rets = []
-
-            # Si hay 1 período previo, estructura antigua era [j, i, r]
-            if num_periodos_nuevo == 2:
-                justs = [valores_antiguos[0] if len(valores_antiguos) > 0 else ""]
-                injs = [valores_antiguos[1] if len(valores_antiguos) > 1 else ""]
-                rets = [valores_antiguos[2] if len(valores_antiguos) > 2 else ""]
-            else:
-                # Ya estaba en estructura correcta, extraer valores
-                for i in range(num_periodos - 1):
-                    justs.append(valores_antiguos[i] if i < len(valores_antiguos) else "")
-                for i in range(num_periodos - 1):
-                    idx = (num_periodos - 1) + i
-                    injs.append(valores_antiguos[idx] if idx < len(valores_antiguos) else "")
-                for i in range(num_periodos - 1):
-                    idx = 2 * (num_periodos - 1) + i
-                    rets.append(valores_antiguos[idx] if idx < len(valores_antiguos) else "")
-
-            # Añadir espacio para nuevo período
-            justs.append("")
-            injs.append("")
-            rets.append("")
-
-            # Construir nueva estructura: todas Just, todas Inj, todos Ret
-            valores_nuevos = justs + injs + rets
-            nuevos_alumnos[nombre] = valores_nuevos
-
-        alumnos = nuevos_alumnos
-
-        # Añadir datos del nuevo período
-        pos_just = num_periodos_nuevo - 1
-        pos_inj = num_periodos_nuevo + (num_periodos_nuevo - 1)
-        pos_ret = 2 * num_periodos_nuevo + (num_periodos_nuevo - 1)
-
-        for nombre, fj, fi, r in datos_nuevos:
-            if nombre in alumnos:
-                valores = list(alumnos[nombre])
-                valores[pos_just] = fj
-                valores[pos_inj] = fi
-                valores[pos_ret] = r
-                alumnos[nombre] = valores
-            else:
-                # Alumno nuevo
-                valores = [""] * (3 * num_periodos_nuevo)
-                valores[pos_just] = fj
-                valores[pos_inj] = fi
-                valores[pos_ret] = r
-                alumnos[nombre] = valores
-
-    return {
-        'cabeceras': cabeceras,
-        'periodos': periodos,
-        'alumnos': alumnos
-    }
-
-def crear_ods(hojas_fusionadas, output_filename):
-    """Crear un archivo ODS con múltiples hojas (nueva versión con estructura fusionada)"""
-
-    # Crear el contenido XML del archivo content.xml
-    office_ns = "urn:oasis:names:tc:opendocument:xmlns:office:1.0"
-    table_ns = "urn:oasis:names:tc:opendocument:xmlns:table:1.0"
-    text_ns = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
-
-    # Raíz del documento
-    root = Element("{%s}document-content" % office_ns)
-    root.set("{%s}version" % office_ns, "1.2")
-    root.set("xmlns:office", office_ns)
-    root.set("xmlns:table", table_ns)
-    root.set("xmlns:text", text_ns)
-
-    # Cuerpo del documento
-    body = SubElement(root, "{%s}body" % office_ns)
-    spreadsheet = SubElement(body, "{%s}spreadsheet" % office_ns)
-
-    # Procesar cada hoja
-    for nombre_hoja, hoja_data in hojas_fusionadas.items():
-        # El nombre ya debería estar normalizado, pero por seguridad lo verificamos
-        sheet_name = normalizar_nombre_hoja(nombre_hoja)
-
-        # Crear la tabla (hoja)
-        table = SubElement(spreadsheet, "{%s}table" % table_ns)
-        table.set("{%s}name" % table_ns, escape_xml(sheet_name))
-
-        # Obtener estructura de la hoja
-        cabeceras = hoja_data['cabeceras']
-        alumnos = hoja_data['alumnos']
-
-        # Identificar columnas de Justificadas, Injustificadas y Retrasos para las fórmulas TOTAL
-        cols_justificadas = []
-        cols_injustificadas = []
-        cols_retrasos = []
-        for idx, header in enumerate(cabeceras):
-            col_letter = chr(65 + idx)  # A=65 en ASCII (columna A es Alumno/a)
-            if 'TOTAL' in header:
-                # Saltar columnas TOTAL
+        hoja = HojaFaltas.desde_tabla(hoja_existente)
+
+    # Si el período ya existe se sobrescriben los valores de los alumnos del PDF;
+    # si es nuevo se añade un bloque de 3 columnas (Justificadas, Injustificadas, Retrasos)
+    hoja.fijar_periodo(periodo_nuevo, datos_nuevos)
+    return hoja
+
+def clave_periodo(periodo):
+    """Clave para ordenar períodos 'DD/MM/YYYY - DD/MM/YYYY' por fecha de inicio y de fin"""
+    fechas = re.findall(r'(\d{2})/(\d{2})/(\d{4})', periodo)
+    if len(fechas) != 2:
+        # Períodos con otro formato: al final, en su orden original
+        return (1,)
+    return (0,) + tuple((int(anio), int(mes), int(dia)) for dia, mes, anio in fechas)
+
+def planificar_fusion(resultados):
+    """Agrupa los PDFs analizados por hoja normalizada.
+
+    Devuelve {nombre_hoja: [(periodo, datos), ...]} conservando el orden de los
+    PDFs dentro de cada hoja, para que un PDF posterior del mismo período
+    sobrescriba a uno anterior igual que al fusionarlos de uno en uno.
+    """
+    plan = {}
+    for nombre_materia, periodo, datos in resultados:
+        plan.setdefault(normalizar_nombre_hoja(nombre_materia), []).append((periodo, datos))
+    return plan
+
+def fusionar_plan(hojas, plan):
+    """Construye cada hoja del plan en una sola pasada, con los períodos en orden cronológico"""
+    for nombre_hoja, entradas in plan.items():
+        hoja = hojas.get(nombre_hoja)
+        for periodo, datos in entradas:
+            hoja = fusionar_datos_hoja(hoja, periodo, datos)
+        hoja.ordenar_periodos()
+        hojas[nombre_hoja] = hoja
+    return hojas
+
+def _celda_texto(texto):
+    """XML de una celda de texto"""
+    return ('<table:table-cell office:value-type="string">'
+            f'<text:p>{escape_xml(texto)}</text:p></table:table-cell>')
+
+CELDA_VACIA = '<table:table-cell/>'
+
+def _agrupar_celdas(celdas):
+    """Une las celdas idénticas consecutivas en una sola con table:number-columns-repeated"""
+    for celda, grupo in itertools.groupby(celdas):
+        cantidad = sum(1 for _ in grupo)
+        if cantidad == 1:
+            yield celda
+        else:
+            yield celda.replace('<table:table-cell',
+                                f'<table:table-cell table:number-columns-repeated="{cantidad}"', 1)
+
+def _celda_numero(valor, formula=None):
+    """XML de una celda numérica, opcionalmente con fórmula"""
+    if formula is None:
+        # Valor tal cual se leyó del PDF o del ODS existente
+        return ('<table:table-cell office:value-type="float" '
+                f'office:value="{escape_xml(valor)}"><text:p>{escape_xml(valor)}</text:p>'
+                '</table:table-cell>')
+
+    # Total calculado: valor inicial de la fórmula
+    texto = str(int(valor)) if valor == int(valor) else str(valor)
+    return ('<table:table-cell office:value-type="float" '
+            f'table:formula="{escape_xml(formula)}" office:value="{valor}">'
+            f'<text:p>{texto}</text:p></table:table-cell>')
+
+def letra_columna(indice):
+    """Letra de una columna de hoja de cálculo a partir de su índice (0 = A, 25 = Z, 26 = AA)"""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+def formula_suma(primera, ultima, fila):
+    """Fórmula OpenFormula que suma las columnas primera..ultima (índices) de una fila"""
+    if primera > ultima:
+        return "of:=0"
+    return f"of:=SUM([.{letra_columna(primera)}{fila}:.{letra_columna(ultima)}{fila}])"
+
+def _filas_xml_hoja(hoja):
+    """Genera el XML de cada fila (table:table-row) de una hoja, una a una"""
+    if not isinstance(hoja, HojaFaltas):
+        hoja = HojaFaltas.desde_tabla(hoja)
+
+    cabeceras = hoja.cabeceras()
+    num_periodos = len(hoja.periodos)
+    num_ji = 2 * num_periodos
+
+    # Las columnas de cada tipo son contiguas (la columna A es Alumno/a), así
+    # que cada TOTAL es la suma de un único rango: Justificadas e Injustificadas
+    # ocupan las columnas 1..num_ji y los Retrasos las siguientes num_periodos
+
+    # Fila de cabecera (incluyendo columnas TOTAL)
+    celdas = [_celda_texto(header) for header in cabeceras]
+    celdas.append(_celda_texto("TOTAL Justificadas y Injustificadas"))
+    celdas.append(_celda_texto("TOTAL Retrasos"))
+    yield f"<table:table-row>{''.join(celdas)}</table:table-row>"
+
+    # Filas de datos de alumnos
+    for row_num, (nombre_alumno, valores) in enumerate(hoja.filas(), start=2):
+        celdas = [_celda_texto(nombre_alumno)]
+
+        # Valores numéricos (excepto TOTAL) y sus sumas por tipo
+        total_ji_value = 0
+        total_r_value = 0
+        celdas_valores = []
+        for i, cell_value in enumerate(valores):
+            if cell_value is None:
+                celdas_valores.append(CELDA_VACIA)
                 continue
-            elif 'Justificadas' in header:
-                cols_justificadas.append(col_letter)
-            elif 'Injustificadas' in header:
-                cols_injustificadas.append(col_letter)
-            elif 'Retrasos' in header:
-                cols_retrasos.append(col_letter)
-
-        # Añadir fila de cabecera (incluyendo columnas TOTAL)
-        header_row = SubElement(table, "{%s}table-row" % table_ns)
-        for header in cabeceras:
-            table_cell = SubElement(header_row, "{%s}table-cell" % table_ns)
-            table_cell.set("{%s}value-type" % office_ns, "string")
-            p = SubElement(table_cell, "{%s}p" % text_ns)
-            p.text = escape_xml(header)
-
-        # Añadir cabeceras TOTAL
-        total_ji_header = SubElement(header_row, "{%s}table-cell" % table_ns)
-        total_ji_header.set("{%s}value-type" % office_ns, "string")
-        p = SubElement(total_ji_header, "{%s}p" % text_ns)
-        p.text = "TOTAL Justificadas y Injustificadas"
-
-        total_r_header = SubElement(header_row, "{%s}table-cell" % table_ns)
-        total_r_header.set("{%s}value-type" % office_ns, "string")
-        p = SubElement(total_r_header, "{%s}p" % text_ns)
-        p.text = "TOTAL Retrasos"
-
-        # Añadir las filas de datos de alumnos
-        for row_num, (nombre_alumno, valores) in enumerate(alumnos.items(), start=2):
-            table_row = SubElement(table, "{%s}table-row" % table_ns)
-
-            # Primera celda: nombre del alumno
-            name_cell = SubElement(table_row, "{%s}table-cell" % table_ns)
-            name_cell.set("{%s}value-type" % office_ns, "string")
-            p = SubElement(name_cell, "{%s}p" % text_ns)
-            p.text = escape_xml(nombre_alumno)
-
-            # Resto de celdas: valores numéricos (excepto TOTAL)
-            for cell_value in valores:
-                table_cell = SubElement(table_row, "{%s}table-cell" % table_ns)
-                if cell_value == "" or cell_value is None:
-                    # Celda vacía
-                    p = SubElement(table_cell, "{%s}p" % text_ns)
-                    p.text = ""
-                else:
-                    # Valor numérico
-                    table_cell.set("{%s}value-type" % office_ns, "float")
-                    table_cell.set("{%s}value" % office_ns, str(cell_value))
-                    p = SubElement(table_cell, "{%s}p" % text_ns)
-                    p.text = str(cell_value)
-
-            # Añadir columna TOTAL Justificadas y Injustificadas
-            total_ji_cell = SubElement(table_row, "{%s}table-cell" % table_ns)
-            total_ji_cell.set("{%s}value-type" % office_ns, "float")
-
-            # Construir fórmula: suma de todas las Just + todas las Inj
-            formula_ji_parts = []
-            for col in cols_justificadas + cols_injustificadas:
-                formula_ji_parts.append(f"{col}{row_num}")
-
-            formula_ji = f"={'+'.join(formula_ji_parts)}" if formula_ji_parts else "=0"
-            total_ji_cell.set("{%s}formula" % table_ns, formula_ji)
-
-            # Calcular el valor inicial de la fórmula
-            total_ji_value = 0
-            for i, valor in enumerate(valores):
-                if i < len(cols_justificadas):
-                    # Es una columna Justificada
-                    try:
-                        total_ji_value += float(valor) if valor != "" else 0
-                    except:
-                        pass
-                elif i < len(cols_justificadas) + len(cols_injustificadas):
-                    # Es una columna Injustificada
-                    try:
-                        total_ji_value += float(valor) if valor != "" else 0
-                    except:
-                        pass
-
-            # Establecer el valor calculado
-            total_ji_cell.set("{%s}value" % office_ns, str(total_ji_value))
-            p = SubElement(total_ji_cell, "{%s}p" % text_ns)
-            p.text = str(int(total_ji_value)) if total_ji_value == int(total_ji_value) else str(total_ji_value)
-
-            # Añadir columna TOTAL Retrasos
-            total_r_cell = SubElement(table_row, "{%s}table-cell" % table_ns)
-            total_r_cell.set("{%s}value-type" % office_ns, "float")
-
-            # Construir fórmula: suma de todos los Retrasos
-            formula_r_parts = []
-            for col in cols_retrasos:
-                formula_r_parts.append(f"{col}{row_num}")
-
-            formula_r = f"={'+'.join(formula_r_parts)}" if formula_r_parts else "=0"
-            total_r_cell.set("{%s}formula" % table_ns, formula_r)
-
-            # Calcular el valor inicial de la fórmula
-            total_r_value = 0
-            inicio_retrasos = len(cols_justificadas) + len(cols_injustificadas)
-            for i, valor in enumerate(valores):
-                if i >= inicio_retrasos:
-                    # Es una columna Retrasos
-                    try:
-                        total_r_value += float(valor) if valor != "" else 0
-                    except:
-                        pass
-
-            # Establecer el valor calculado
-            total_r_cell.set("{%s}value" % office_ns, str(total_r_value))
-            p = SubElement(total_r_cell, "{%s}p" % text_ns)
-            p.text = str(int(total_r_value)) if total_r_value == int(total_r_value) else str(total_r_value)
-
-    # Convertir a string XML
-    xml_str = tostring(root, encoding='utf-8')
-
-    # Formatear el XML
-    dom = minidom.parseString(xml_str)
-    pretty_xml = dom.toprettyxml(encoding='utf-8')
-
-    # Crear el archivo ODS (es un archivo ZIP)
-    with zipfile.ZipFile(output_filename, 'w', zipfile.ZIP_DEFLATED) as zf:
-        # mimetype (sin comprimir)
-        zf.writestr('mimetype', 'application/vnd.oasis.opendocument.spreadsheet',
-                   compress_type=zipfile.ZIP_STORED)
-
-        # META-INF/manifest.xml
-        manifest = '''<?xml version="1.0" encoding="UTF-8"?>
-<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0">
-  <manifest:file-entry manifest:media-type="application/vnd.oasis.opendocument.spreadsheet" manifest:full-path="/"/>
-  <manifest:file-entry manifest:media-type="text/xml" manifest:full-path="content.xml"/>
-</manifest:manifest>'''
-        zf.writestr('META-INF/manifest.xml', manifest)
+            celdas_valores.append(_celda_numero(cell_value))
+            if i < num_ji:
+                total_ji_value += cell_value
+            else:
+                total_r_value += cell_value
+        # Las celdas iguales seguidas (los huecos de los alumnos que se incorporan o
+        # se dan de baja a mitad de curso, las rachas de ceros) se escriben una vez
+        celdas.extend(_agrupar_celdas(celdas_valores))
+
+        # TOTAL Justificadas y Injustificadas: suma de todas las Just + todas las Inj
+        formula_ji = formula_suma(1, num_ji, row_num)
+        celdas.append(_celda_numero(float(total_ji_value), formula_ji))
+
+        # TOTAL Retrasos: suma de todos los Retrasos
+        formula_r = formula_suma(num_ji + 1, 3 * num_periodos, row_num)
+        celdas.append(_celda_numero(float(total_r_value), formula_r))
+
+        yield f"<table:table-row>{''.join(celdas)}</table:table-row>"
+
+def resumir_hojas(hojas):
+    """Suma los recuentos de todas las hojas por alumno y período en una sola pasada.
+
+    hojas es un diccionario {nombre: HojaFaltas} o un iterable de pares, como en
+    crear_ods(). Devuelve un HojaFaltas cuyas filas son los alumnos de todas las
+    materias (en orden de aparición) y cuyos valores son las sumas, junto con
+    {alumno: número de materias}. El coste es lineal en el número de celdas.
+    """
+    resumen = HojaFaltas()
+    materias = {}
+    pares = hojas.items() if isinstance(hojas, dict) else hojas
+    for _, hoja in pares:
+        # Posición de cada alumno de la hoja dentro del resumen
+        posiciones = [resumen._posicion(alumno) for alumno in hoja.alumnos]
+        for alumno in hoja.alumnos:
+            materias[alumno] = materias.get(alumno, 0) + 1
+        for periodo in hoja.periodos:
+            bloque = resumen._bloque(periodo)
+            for tipo in TIPOS_FALTA:
+                destino = bloque[tipo]
+                for pos, valor in enumerate(hoja.bloques[periodo][tipo]):
+                    if valor is None:
+                        continue
+                    pos_resumen = posiciones[pos]
+                    if pos_resumen >= len(destino):
+                        destino.extend([None] * (pos_resumen + 1 - len(destino)))
+                    anterior = destino[pos_resumen]
+                    destino[pos_resumen] = valor if anterior is None else anterior + valor
+    resumen.ordenar_periodos()
+    return resumen, materias
+
+def xml_hoja_resumen(hojas, umbrales=None):
+    """XML de la hoja de resumen: por alumno, las faltas de cada período sumadas en
+    todas las materias, el total de cada tipo y en cuántas materias aparece.
+
+    umbrales es un diccionario {tipo: límite}; si se indica, se añade una columna
+    Avisos con los totales que alcanzan o superan su límite.
+    """
+    resumen, materias = resumir_hojas(hojas)
+    num_periodos = len(resumen.periodos)
+
+    cabeceras = resumen.cabeceras() + [f"TOTAL {tipo}" for tipo in TIPOS_FALTA] + ["Materias"]
+    if umbrales:
+        cabeceras.append("Avisos")
+    filas = [f'<table:table table:name="{escape_xml(NOMBRE_HOJA_RESUMEN)}">',
+             f"<table:table-row>{''.join(_celda_texto(c) for c in cabeceras)}</table:table-row>"]
+
+    for row_num, (nombre_alumno, valores) in enumerate(resumen.filas(), start=2):
+        celdas = [_celda_texto(nombre_alumno)]
+        celdas.extend(_agrupar_celdas(
+            [CELDA_VACIA if valor is None else _celda_numero(valor) for valor in valores]))
+
+        totales = {}
+        for num_tipo, tipo in enumerate(TIPOS_FALTA):
+            primera = num_tipo * num_periodos
+            totales[tipo] = sum(valor for valor in valores[primera:primera + num_periodos]
+                                if valor is not None)
+            celdas.append(_celda_numero(float(totales[tipo]),
+                                        formula_suma(primera + 1, primera + num_periodos, row_num)))
+        celdas.append(_celda_numero(materias[nombre_alumno]))
+
+        if umbrales:
+            avisos = [f"{tipo}: {totales[tipo]:g} (límite {limite:g})"
+                      for tipo, limite in umbrales.items() if totales[tipo] >= limite]
+            celdas.append(_celda_texto('; '.join(avisos)) if avisos else CELDA_VACIA)
+
+        filas.append(f"<table:table-row>{''.join(celdas)}</table:table-row>")
+
+    filas.append('</table:table>')
+    return ''.join(filas)
+
+def xml_resumen_libro(hojas, args, num_hojas=None):
+    """XML de la hoja de resumen según las opciones, o None si no hay que escribirla.
+
+    Solo se escribe si hay al menos dos materias (con una sola repetiría su hoja)
+    y no se ha pedido --sin-resumen. Si hojas es un iterable de pares hay que
+    indicar num_hojas.
+    """
+    if num_hojas is None:
+        num_hojas = len(hojas)
+    if args.sin_resumen or num_hojas < 2:
+        return None
+    return xml_hoja_resumen(hojas, args.umbrales)
+
+def crear_ods(hojas_fusionadas, output_filename, indentar=False, conservar_xml=False,
+              xml_resumen=None, pdfs_fusionados=None):
+    """Crear un archivo ODS con múltiples hojas (nueva versión con estructura fusionada)
+
+    content.xml se escribe en streaming dentro del ZIP: cada fila se genera y se
+    comprime según se produce, sin construir el documento completo en memoria.
+    Las hojas leídas de un ODS anterior que no han cambiado se copian con su XML
+    original en lugar de regenerarse.
+    Con indentar=True se pone cada fila en su propia línea (útil para depurar).
+    hojas_fusionadas puede ser un diccionario o un iterable de pares
+    (nombre, hoja), para ir generando las hojas de una en una (ver hojas_desde_bd()).
+    xml_resumen es el XML de la hoja de resumen (ver xml_hoja_resumen()), que se
+    escribe la primera.
+
+    Junto a content.xml se guarda una copia del modelo (ARCHIVO_MODELO) con los
+    recuentos de cada hoja y pdfs_fusionados ({clave: [nombre_hoja, periodo]} de
+    los PDFs cuyos datos ya contiene), para que leer_modelo_ods() pueda cargarlo
+    la próxima vez sin analizar content.xml.
+
+    El archivo se escribe primero en un temporal del mismo directorio y luego se
+    renombra, así que nunca queda a la vista un ODS a medio escribir. Con
+    conservar_xml=True, las hojas regeneradas guardan su XML y quedan marcadas
+    como sin cambios (para que una escritura posterior pueda reutilizarlo).
+    """
+    import zipfile
+
+    sangria = (lambda nivel: "\n" + "  " * nivel) if indentar else (lambda nivel: "")
+    destino_final = Path(output_filename)
+    temporal = destino_final.with_name(f".{destino_final.name}.{os.getpid()}.tmp")
+    hojas_escritas = []
+    modelo_hojas = []
 
-        # content.xml
-        zf.writestr('content.xml', pretty_xml)
+    try:
+        # Crear el archivo ODS (es un archivo ZIP)
+        with zipfile.ZipFile(temporal, 'w', zipfile.ZIP_DEFLATED) as zf:
+            # mimetype (sin comprimir)
+            zf.writestr('mimetype', 'application/vnd.oasis.opendocument.spreadsheet',
+                       compress_type=zipfile.ZIP_STORED)
+
+            # META-INF/manifest.xml
+            zf.writestr('META-INF/manifest.xml', MANIFEST_ODS)
+
+            # content.xml
+            with zf.open('content.xml', 'w') as destino, \
+                    io.TextIOWrapper(destino, encoding='utf-8') as out:
+                out.write(ENCABEZADO_CONTENT)
+                out.write(f'{sangria(1)}<office:body>{sangria(2)}<office:spreadsheet>')
+                if xml_resumen is not None:
+                    out.write(sangria(3))
+                    out.write(xml_resumen)
+
+                pares = (hojas_fusionadas.items() if isinstance(hojas_fusionadas, dict)
+                         else hojas_fusionadas)
+                for nombre_hoja, hoja_data in pares:
+                    # El nombre ya debería estar normalizado, pero por seguridad lo verificamos
+                    sheet_name = normalizar_nombre_hoja(nombre_hoja)
+                    if not isinstance(hoja_data, HojaFaltas):
+                        hoja_data = HojaFaltas.desde_tabla(hoja_data)
+                    # Cada hoja se serializa ya para no retener las que llegan de una en una
+                    modelo_hojas.append(json.dumps(hoja_data.a_modelo(sheet_name),
+                                                   ensure_ascii=False, separators=(',', ':')))
+
+                    # Hoja sin cambios desde la lectura: copiar su XML tal cual
+                    if not hoja_data.modificada and hoja_data.xml_original is not None:
+                        out.write(sangria(3))
+                        out.write(hoja_data.xml_original)
+                        continue
+
+                    xml = [] if conservar_xml else None
+                    fragmentos = itertools.chain(
+                        [f'<table:table table:name="{escape_xml(sheet_name)}">'],
+                        (sangria(4) + fila for fila in _filas_xml_hoja(hoja_data)),
+                        [f'{sangria(3)}</table:table>'])
+
+                    out.write(sangria(3))
+                    for fragmento in fragmentos:
+                        out.write(fragmento)
+                        if xml is not None:
+                            xml.append(fragmento)
+
+                    if xml is not None:
+                        hojas_escritas.append((hoja_data, ''.join(xml)))
+
+                out.write(f'{sangria(2)}</office:spreadsheet>{sangria(1)}</office:body>\n'
+                          '</office:document-content>\n')
+
+            # Modelo, con la huella (CRC y tamaño) del content.xml recién escrito
+            info = zf.getinfo('content.xml')
+            cabecera_modelo = json.dumps({
+                'formato': FORMATO_MODELO,
+                'content': [info.CRC, info.file_size],
+                'pdfs': pdfs_fusionados or {},
+            }, ensure_ascii=False, separators=(',', ':'))
+            zf.writestr(ARCHIVO_MODELO,
+                        f'{cabecera_modelo[:-1]},"hojas":[{",".join(modelo_hojas)}]}}')
+
+        os.replace(temporal, destino_final)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            temporal.unlink()
+        raise
+
+    # El archivo ya está en su sitio: las hojas escritas quedan como sin cambios
+    for hoja_data, xml in hojas_escritas:
+        hoja_data.xml_original = xml
+        hoja_data.modificada = False
+
+# Exportación en formato largo (--csv, --jsonl): un registro por materia, período y alumno
+CAMPOS_EXPORTACION = ('materia', 'periodo', 'alumno', 'justificadas', 'injustificadas', 'retrasos')
+
+def registros_hojas(hojas):
+    """Genera (materia, periodo, alumno, fj, fi, r) de cada recuento de las hojas.
+
+    hojas es un diccionario {nombre: HojaFaltas} o un iterable de pares, como en
+    crear_ods(). La materia es el nombre de la hoja y los períodos van en orden
+    cronológico; los alumnos sin datos en un período no generan registro.
+    """
+    pares = hojas.items() if isinstance(hojas, dict) else hojas
+    for nombre_hoja, hoja in pares:
+        for periodo in hoja.periodos:
+            for pos, alumno in enumerate(hoja.alumnos):
+                valores = [hoja.valor(periodo, tipo, pos) for tipo in TIPOS_FALTA]
+                if any(valor is not None for valor in valores):
+                    yield (nombre_hoja, periodo, alumno, *valores)
+
+def exportar_registros(hojas, destino, formato):
+    """Escribe los registros de las hojas en CSV o JSON Lines según se generan.
+
+    Como crear_ods(), escribe en un temporal y lo renombra al terminar.
+    Devuelve el número de registros escritos.
+    """
+    destino = Path(destino)
+    temporal = destino.with_name(f".{destino.name}.{os.getpid()}.tmp")
+    num_registros = 0
+    try:
+        with open(temporal, 'w', encoding='utf-8', newline='') as f:
+            if formato == 'csv':
+                import csv
+                escritor = csv.writer(f)
+                escritor.writerow(CAMPOS_EXPORTACION)
+                for registro in registros_hojas(hojas):
+                    escritor.writerow(registro)
+                    num_registros += 1
+            else:
+                for registro in registros_hojas(hojas):
+                    f.write(json.dumps(dict(zip(CAMPOS_EXPORTACION, registro)), ensure_ascii=False))
+                    f.write('\n')
+                    num_registros += 1
+        os.replace(temporal, destino)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            temporal.unlink()
+        raise
+    return num_registros
+
+def _exportar(directorio, args, obtener_hojas, metricas=None):
+    """Escribe las exportaciones pedidas en la línea de comandos.
+
+    obtener_hojas devuelve las hojas cada vez que se llama, para poder
+    recorrerlas una vez por formato aunque se generen desde la base de datos.
+    """
+    for formato, ruta in (('csv', args.csv), ('jsonl', args.jsonl)):
+        if not ruta:
+            continue
+        with _medir(metricas, 'exportacion'):
+            num_registros = exportar_registros(obtener_hojas(), directorio / ruta, formato)
+        print(f"✓ Exportados {num_registros} registros a {ruta}")
+
+# Almacén SQLite opcional (--bd): un registro por materia, período y alumno.
+# Las columnas de recuentos son NUMERIC para conservar los enteros como enteros.
+ESQUEMA_BD = """
+CREATE TABLE IF NOT EXISTS hojas (
+    hoja TEXT PRIMARY KEY,
+    orden INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alumnos (
+    hoja TEXT NOT NULL,
+    alumno TEXT NOT NULL,
+    orden INTEGER NOT NULL,
+    PRIMARY KEY (hoja, alumno),
+    UNIQUE (hoja, orden)
+);
+CREATE TABLE IF NOT EXISTS faltas (
+    hoja TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    alumno TEXT NOT NULL,
+    justificadas NUMERIC,
+    injustificadas NUMERIC,
+    retrasos NUMERIC,
+    PRIMARY KEY (hoja, periodo, alumno)
+);
+CREATE INDEX IF NOT EXISTS faltas_por_alumno ON faltas (alumno);
+CREATE INDEX IF NOT EXISTS faltas_por_periodo ON faltas (periodo);
+"""
 
-def main():
+def abrir_bd(ruta):
+    """Abre (o crea) la base de datos SQLite de faltas"""
+    import sqlite3
+
+    conexion = sqlite3.connect(ruta)
+    conexion.executescript(ESQUEMA_BD)
+    return conexion
+
+def _guardar_hoja_bd(conexion, hoja, alumnos, periodos):
+    """Inserta una hoja, sus alumnos (en orden) y las filas [nombre, fj, fi, r] de cada período.
+
+    Los alumnos nuevos se añaden al final de la hoja y los recuentos existentes
+    se sobrescriben, igual que en HojaFaltas.fijar_periodo().
+    """
+    conexion.execute(
+        "INSERT OR IGNORE INTO hojas (hoja, orden) "
+        "VALUES (?, (SELECT COUNT(*) FROM hojas))", (hoja,))
+    conexion.executemany(
+        "INSERT OR IGNORE INTO alumnos (hoja, alumno, orden) "
+        "VALUES (?1, ?2, (SELECT COALESCE(MAX(orden) + 1, 0) FROM alumnos WHERE hoja = ?1))",
+        ((hoja, alumno) for alumno in alumnos))
+    for periodo, datos in periodos:
+        conexion.executemany(
+            "INSERT INTO faltas (hoja, periodo, alumno, justificadas, injustificadas, retrasos) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (hoja, periodo, alumno) DO UPDATE SET "
+            "justificadas = excluded.justificadas, injustificadas = excluded.injustificadas, "
+            "retrasos = excluded.retrasos "
+            "WHERE faltas.justificadas IS NOT excluded.justificadas "
+            "OR faltas.injustificadas IS NOT excluded.injustificadas "
+            "OR faltas.retrasos IS NOT excluded.retrasos",
+            ((hoja, periodo, nombre, _a_numero(fj), _a_numero(fi), _a_numero(r))
+             for nombre, fj, fi, r in datos))
+
+def guardar_en_bd(conexion, resultados):
+    """Guarda los resultados de procesar_pdf() en una sola transacción.
+
+    Devuelve el número de filas nuevas o modificadas (0 si ya estaba todo).
+    """
+    cambios_antes = conexion.total_changes
+    with conexion:
+        for nombre_hoja, entradas in planificar_fusion(resultados).items():
+            alumnos = [fila[0] for _, datos in entradas for fila in datos]
+            _guardar_hoja_bd(conexion, nombre_hoja, alumnos, entradas)
+    return conexion.total_changes - cambios_antes
+
+def importar_ods_a_bd(conexion, hojas):
+    """Vuelca en la base de datos las hojas {nombre: HojaFaltas} de un ODS existente"""
+    with conexion:
+        for nombre_hoja, hoja in hojas.items():
+            periodos = []
+            for periodo in hoja.periodos:
+                datos = []
+                for pos, nombre in enumerate(hoja.alumnos):
+                    valores = [hoja.valor(periodo, tipo, pos) for tipo in TIPOS_FALTA]
+                    if any(valor is not None for valor in valores):
+                        datos.append([nombre] + valores)
+                periodos.append((periodo, datos))
+            _guardar_hoja_bd(conexion, nombre_hoja, hoja.alumnos, periodos)
+
+def contar_hojas_bd(conexion):
+    """Número de hojas guardadas en la base de datos"""
+    return conexion.execute("SELECT COUNT(*) FROM hojas").fetchone()[0]
+
+def hojas_desde_bd(conexion):
+    """Genera (nombre, HojaFaltas) de cada hoja de la base de datos, de una en una.
+
+    Solo hay una hoja en memoria a la vez, así que se puede pasar directamente a
+    crear_ods() sin cargar todo el libro.
+    """
+    nombres = [fila[0] for fila in conexion.execute("SELECT hoja FROM hojas ORDER BY orden")]
+    for nombre_hoja in nombres:
+        hoja = HojaFaltas()
+        for (alumno,) in conexion.execute(
+                "SELECT alumno FROM alumnos WHERE hoja = ? ORDER BY orden", (nombre_hoja,)):
+            hoja._posicion(alumno)
+        for periodo, alumno, fj, fi, r in conexion.execute(
+                "SELECT periodo, alumno, justificadas, injustificadas, retrasos "
+                "FROM faltas WHERE hoja = ? ORDER BY rowid", (nombre_hoja,)):
+            bloque = hoja._bloque(periodo)
+            pos = hoja._posicion(alumno)
+            for tipo, valor in zip(TIPOS_FALTA, (fj, fi, r)):
+                _fijar_valor(bloque[tipo], pos, valor)
+        hoja.ordenar_periodos()
+        yield nombre_hoja, hoja
+
+def consultar_alumno(conexion, alumno):
+    """Recuentos de un alumno en todas las materias: [(hoja, periodo, fj, fi, r)]"""
+    return conexion.execute(
+        "SELECT hoja, periodo, justificadas, injustificadas, retrasos "
+        "FROM faltas WHERE alumno = ?", (alumno,)).fetchall()
+
+def consultar_periodo(conexion, periodo):
+    """Recuentos de un período en todas las hojas: [(hoja, alumno, fj, fi, r)]"""
+    return conexion.execute(
+        "SELECT hoja, alumno, justificadas, injustificadas, retrasos "
+        "FROM faltas WHERE periodo = ?", (periodo,)).fetchall()
+
+def parsear_argumentos(argv=None):
+    """Lee las opciones de la línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Convierte los PDFs de faltas del directorio actual en un archivo ODS.")
+    parser.add_argument(
+        '-j', '--procesos', type=int, nargs='?', const=0, default=None, metavar='N',
+        help="Procesar los PDFs en paralelo con N procesos (sin N: tantos como núcleos)")
+    parser.add_argument(
+        '--motor', choices=list(MOTORES_EXTRACCION), default=MOTOR_POR_DEFECTO,
+        help=f"Motor de extracción del texto de los PDFs (por defecto: {MOTOR_POR_DEFECTO}; "
+             "pdfminer es más rápido)")
+    parser.add_argument(
+        '--limite-segundos', type=float, metavar='SEG',
+        help="Omitir los PDFs que tarden más de SEG segundos en leerse (se leen en procesos "
+             "que se pueden detener)")
+    parser.add_argument(
+        '--limite-paginas', type=int, metavar='N',
+        help="Omitir los PDFs de más de N páginas")
+    parser.add_argument(
+        '--limite-memoria-mb', type=float, metavar='MB',
+        help="Omitir los PDFs que necesiten más de MB megabytes de memoria para leerse "
+             "(solo en Linux y sistemas parecidos)")
+    parser.add_argument(
+        '--sin-filtro', action='store_true',
+        help="Leer enteros todos los PDFs, sin descartar antes por su primera página los que "
+             "no parecen informes de faltas de Raíces")
+    parser.add_argument(
+        '--cache', default=DIRECTORIO_CACHE, metavar='DIR',
+        help=f"Directorio de la caché de extracciones (por defecto: {DIRECTORIO_CACHE})")
+    parser.add_argument(
+        '--sin-cache', action='store_true',
+        help="No usar la caché: volver a extraer todos los PDFs")
+    parser.add_argument(
+        '--cache-max-mb', type=float, default=TAMANO_MAXIMO_CACHE_MB, metavar='MB',
+        help=f"Tamaño máximo de la caché en MB (por defecto: {TAMANO_MAXIMO_CACHE_MB})")
+    parser.add_argument(
+        '--zip', nargs='+', metavar='ZIP',
+        help="Leer los PDFs directamente de estos archivos ZIP (incluidas sus subcarpetas), "
+             "sin descomprimirlos, en lugar de los PDFs del directorio")
+    parser.add_argument(
+        '--lote', nargs='+', metavar='DIR',
+        help="Modo lote: crear o actualizar un ODS en cada uno de estos directorios y en sus "
+             "subdirectorios con PDFs, compartiendo la caché y los procesos")
+    parser.add_argument(
+        '--bd', metavar='ARCHIVO',
+        help="Guardar los datos en esta base de datos SQLite (relativa a cada directorio) "
+             "y generar el ODS a partir de ella")
+    parser.add_argument(
+        '--consultar-alumno', metavar='NOMBRE',
+        help="Con --bd, mostrar las faltas de un alumno en todas las materias y terminar")
+    parser.add_argument(
+        '--consultar-periodo', metavar='PERIODO',
+        help="Con --bd, mostrar las faltas de un período en todas las materias y terminar")
+    parser.add_argument(
+        '--csv', metavar='ARCHIVO',
+        help="Exportar también los datos en CSV, un registro por materia, período y alumno")
+    parser.add_argument(
+        '--jsonl', metavar='ARCHIVO',
+        help="Exportar también los datos en JSON Lines, un registro por materia, período y alumno")
+    parser.add_argument(
+        '--sin-resumen', action='store_true',
+        help=f"No añadir la hoja '{NOMBRE_HOJA_RESUMEN}' con los totales de cada alumno")
+    parser.add_argument(
+        '--umbral', action='append', default=[], metavar='TIPO=N',
+        help="Marcar en la hoja de resumen a los alumnos con N o más faltas de ese tipo "
+             "(justificadas, injustificadas o retrasos); se puede repetir")
+    parser.add_argument(
+        '--vigilar', action='store_true',
+        help="Quedarse vigilando el directorio e incorporar los PDFs nuevos o modificados según lleguen")
+    parser.add_argument(
+        '--intervalo', type=float, default=INTERVALO_VIGILANCIA, metavar='SEG',
+        help=f"Con --vigilar, segundos entre comprobaciones (por defecto: {INTERVALO_VIGILANCIA})")
+    parser.add_argument(
+        '--espera', type=float, default=ESPERA_ESCRITURA, metavar='SEG',
+        help="Con --vigilar, segundos sin cambios antes de reescribir el ODS "
+             f"(por defecto: {ESPERA_ESCRITURA})")
+    parser.add_argument(
+        '--servir', type=int, nargs='?', const=PUERTO_SERVICIO, default=None, metavar='PUERTO',
+        help="Modo servicio: atender por HTTP en 127.0.0.1 (por defecto en el puerto "
+             f"{PUERTO_SERVICIO}) lotes de PDFs para los libros de los subdirectorios, "
+             "manteniendo los procesos y los datos cargados entre peticiones")
+    parser.add_argument(
+        '--metricas', metavar='JSON',
+        help="Medir tiempos por etapa y por PDF y guardar el informe en este archivo")
+    parser.add_argument(
+        '--perfil', metavar='ARCHIVO',
+        help="Guardar un perfil de cProfile del proceso principal (se abre con pstats o snakeviz)")
+    args = parser.parse_args(argv)
+
+    if args.lote and args.vigilar:
+        parser.error("--lote y --vigilar no se pueden usar a la vez")
+    if args.zip and (args.lote or args.vigilar):
+        parser.error("--zip no se puede usar con --lote ni con --vigilar")
+    if args.bd and args.vigilar:
+        parser.error("--bd y --vigilar no se pueden usar a la vez")
+    if args.servir is not None and (args.lote or args.vigilar or args.zip or args.bd):
+        parser.error("--servir no se puede usar con --lote, --vigilar, --zip ni --bd")
+    if (args.consultar_alumno or args.consultar_periodo) and not args.bd:
+        parser.error("--consultar-alumno y --consultar-periodo necesitan --bd")
+
+    args.umbrales = {}
+    for umbral in args.umbral:
+        tipo, _, limite = umbral.partition('=')
+        tipos = {t.lower(): t for t in TIPOS_FALTA}
+        try:
+            args.umbrales[tipos[tipo.strip().lower()]] = float(limite)
+        except (KeyError, ValueError):
+            parser.error(f"umbral no válido: '{umbral}' (se espera TIPO=N, por ejemplo injustificadas=20)")
+    # En el orden de las columnas
+    args.umbrales = {tipo: args.umbrales[tipo] for tipo in TIPOS_FALTA if tipo in args.umbrales}
+
+    # Límites por PDF: None si no se ha pedido ninguno
+    args.limites = {clave: valor for clave, valor in (('segundos', args.limite_segundos),
+                                                      ('paginas', args.limite_paginas),
+                                                      ('memoria_mb', args.limite_memoria_mb))
+                    if valor is not None} or None
+    if args.limites and any(valor <= 0 for valor in args.limites.values()):
+        parser.error("los límites por PDF deben ser positivos")
+    if args.limite_memoria_mb and memoria_proceso_mb() is None:
+        print("⚠ El límite de memoria por PDF solo se puede aplicar en Linux: se ignora\n")
+
+    if args.procesos == 0:
+        args.procesos = os.cpu_count() or 1
+    elif args.procesos is not None and args.procesos < 0:
+        parser.error("el número de procesos debe ser positivo")
+
+    return args
+
+def main(argv=None):
     """Función principal"""
+    args = parsear_argumentos(argv)
+    metricas = Metricas() if args.metricas else None
+
+    perfil = None
+    if args.perfil:
+        import cProfile
+        perfil = cProfile.Profile()
+        perfil.enable()
+
+    correcto = True
+    try:
+        if args.consultar_alumno or args.consultar_periodo:
+            correcto = consultar(args)
+        elif args.vigilar:
+            vigilar(args, metricas)
+        elif args.servir is not None:
+            servir(args)
+        elif args.lote:
+            correcto = generar_lote(args, metricas)
+        else:
+            generar(args, metricas)
+    finally:
+        if perfil is not None:
+            perfil.disable()
+            perfil.dump_stats(args.perfil)
+            print(f"✓ Perfil guardado en {args.perfil}")
+        if metricas is not None:
+            metricas.mostrar_resumen()
+            metricas.guardar(args.metricas)
+            print(f"✓ Métricas guardadas en {args.metricas}")
+
+    if not correcto:
+        sys.exit(1)
+
+def cargar_hojas_existentes(archivo_ods):
+    """Lee el ODS existente como ({nombre_hoja: HojaFaltas}, XML de la hoja de resumen,
+    PDFs fusionados).
+
+    Las hojas son None si el archivo no existe o no se puede leer. El XML de la
+    hoja de resumen (None si no la tiene o no se puede reutilizar) sirve para
+    saber si el resumen ha cambiado sin tener que reescribir el archivo.
+    Se usa el modelo guardado en el ODS si sigue siendo válido (ver
+    leer_modelo_ods()); si no, se analiza content.xml y los PDFs fusionados,
+    {clave: [nombre_hoja, periodo]}, quedan vacíos.
+    """
+    if not Path(archivo_ods).exists():
+        return None, None, {}
+    modelo = leer_modelo_ods(archivo_ods)
+    if modelo is not None:
+        return modelo
+
+    hojas_existentes = leer_ods_existente(archivo_ods)
+    if not hojas_existentes:
+        return hojas_existentes, None, {}
+
+    # Guardar el XML de cada hoja para copiarlo si no cambia
+    xml_hojas = leer_xml_hojas(archivo_ods)
+    hojas = {nombre: HojaFaltas.desde_tabla(hoja, xml_hojas.get(nombre))
+             for nombre, hoja in hojas_existentes.items()}
+    return hojas, xml_hojas.get(NOMBRE_HOJA_RESUMEN), {}
+
+def generar(args, metricas=None):
+    """Procesa los PDFs del directorio actual y crea o actualiza el ODS"""
     print("=" * 70)
     print("Generador de archivo ODS desde PDFs de faltas")
     print("=" * 70)
@@ -567,22 +2366,89 @@ def main():
 
     # Obtener directorio actual
     directorio_actual = Path.cwd()
+    directorio_cache = None if args.sin_cache else directorio_actual / args.cache
 
-    # Obtener todos los PDFs del directorio actual
-    pdf_files = sorted(directorio_actual.glob("*.pdf"))
+    resumen = generar_directorio(directorio_actual, args, directorio_cache, metricas)
+    mostrar_omitidos(resumen['omitidos'])
+    if directorio_cache and resumen['estado'] not in ('sin_pdfs', 'sin_cambios'):
+        podar_cache(directorio_cache, args.cache_max_mb)
 
-    # Filtrar PDFs que no queremos procesar
-    pdf_files = [pdf for pdf in pdf_files]
-
-    if not pdf_files:
-        print("⚠ No se encontraron archivos PDF para procesar en el directorio actual")
+def mostrar_omitidos(omitidos, sangria=""):
+    """Lista los PDFs que se han saltado por superar los límites por documento"""
+    if not omitidos:
         return
+    print(f"\n{sangria}⚠ {len(omitidos)} PDFs omitidos por superar los límites:")
+    for nombre, motivo in omitidos:
+        print(f"{sangria}  - {nombre}: {motivo}")
+
+def generar_directorio(directorio, args, directorio_cache=None, metricas=None,
+                       executor=None, archivo_estado=ARCHIVO_ESTADO):
+    """Procesa los PDFs de un directorio y crea o actualiza su ODS.
+
+    executor es un pool de procesos ya creado que se reutiliza (modo lote) en
+    lugar de crear uno nuevo. Devuelve un resumen con el estado final
+    ('sin_pdfs', 'sin_cambios', 'sin_datos', 'al_dia' o 'escrito'), los PDFs
+    encontrados y procesados, las hojas del ODS, los PDFs omitidos por superar
+    los límites y los que no se pudieron incorporar (fallidos), como (nombre,
+    motivo). Los fallidos se recuerdan en el estado de la ejecución, para
+    volver a avisar de ellos en las siguientes aunque no haya nada que hacer.
+    """
+    # Obtener todos los PDFs del directorio, o de los ZIP indicados con --zip. Las
+    # entradas son los archivos cuya firma decide si hay algo que hacer
+    with _medir(metricas, 'busqueda_pdfs'):
+        if args.zip:
+            entradas = [Path(ruta).resolve() for ruta in args.zip]
+            pdf_files = miembros_zip(entradas)
+        else:
+            pdf_files = sorted(directorio.glob("*.pdf"))
+            entradas = pdf_files
+
+    resumen = {'estado': 'sin_pdfs', 'pdfs': len(pdf_files), 'procesados': 0, 'hojas': 0,
+               'omitidos': [], 'fallidos': []}
+    if not pdf_files:
+        origen = "los archivos ZIP indicados" if args.zip else "el directorio actual"
+        print(f"⚠ No se encontraron archivos PDF para procesar en {origen}")
+        return resumen
+
+    # Leer archivo ODS existente si existe
+    archivo_ods = directorio / NOMBRE_SALIDA
+    otros_archivos = [directorio / ruta for ruta in (args.bd, args.csv, args.jsonl) if ruta]
+    opciones = {'resumen': not args.sin_resumen, 'umbrales': args.umbrales,
+                'limites': args.limites, 'motor': args.motor}
+    if args.sin_filtro:
+        opciones['sin_filtro'] = True
+
+    def guardar_firma():
+        # Si se ha omitido algún PDF no se anota la ejecución, para que la
+        # siguiente vuelva a intentarlo y a avisar de él
+        if directorio_cache and not resumen['omitidos']:
+            guardar_firma_ejecucion(directorio_cache, entradas, archivo_ods, archivo_estado,
+                                    otros_archivos, opciones, resumen['fallidos'])
+
+    # Camino rápido: si nada ha cambiado desde la última ejecución, no hay que
+    # leer el ODS, ni abrir ningún PDF, ni importar pdfplumber
+    fallidos = directorio_cache and sin_cambios_desde_ultima_ejecucion(
+        directorio_cache, entradas, archivo_ods, archivo_estado, otros_archivos, opciones)
+    if fallidos is not None:
+        print(f"✓ Nada que hacer: ni los {len(pdf_files)} PDFs ni '{NOMBRE_SALIDA}' "
+              "han cambiado desde la última ejecución")
+        print(f"  (comprobado en {(time.perf_counter() - INICIO_PROGRAMA) * 1000:.0f} ms)")
+        if fallidos:
+            print(f"⚠ En esa ejecución no se pudieron incorporar {len(fallidos)} PDFs:")
+            for nombre, motivo in fallidos:
+                print(f"  - {nombre}: {motivo}")
+        resumen.update(estado='sin_cambios', fallidos=fallidos,
+                       procesados=len(pdf_files) - len(fallidos))
+        return resumen
 
     print(f"Encontrados {len(pdf_files)} archivos PDF\n")
 
-    # Leer archivo ODS existente si existe
-    archivo_ods = directorio_actual / NOMBRE_SALIDA
-    hojas_existentes = leer_ods_existente(archivo_ods)
+    if args.bd:
+        return generar_desde_bd(directorio, pdf_files, archivo_ods, args, directorio_cache,
+                                metricas, executor, guardar_firma, resumen)
+
+    with _medir(metricas, 'lectura_ods'):
+        hojas_existentes, xml_resumen_anterior, pdfs_anteriores = cargar_hojas_existentes(archivo_ods)
 
     if hojas_existentes:
         print(f"✓ Archivo existente encontrado: {NOMBRE_SALIDA}")
@@ -592,40 +2458,783 @@ def main():
         print(f"  - No se encontró archivo existente, se creará uno nuevo\n")
         hojas_existentes = {}
 
-    # Procesar cada PDF y fusionar con datos existentes
+    # Procesar cada PDF y fusionar con datos existentes. Los que según el modelo
+    # del ODS ya están fusionados no se vuelven a leer (salvo con --sin-cache)
     hojas_fusionadas = dict(hojas_existentes)
-    archivos_procesados = 0
-
-    for pdf_path in pdf_files:
-        nombre_materia, periodo, datos = procesar_pdf(pdf_path)
-        if nombre_materia and periodo and datos:
-            # Normalizar nombre de hoja (truncar a 31 caracteres)
-            nombre_hoja_normalizado = normalizar_nombre_hoja(nombre_materia)
-
-            # Buscar hoja existente por nombre normalizado
-            hoja_existente = hojas_fusionadas.get(nombre_hoja_normalizado, None)
-
-            # Fusionar datos
-            hoja_fusionada = fusionar_datos_hoja(hoja_existente, periodo, datos)
-            hojas_fusionadas[nombre_hoja_normalizado] = hoja_fusionada
-
-            archivos_procesados += 1
-        print()
+    huellas = {}
+    ya_fusionados = {}
+    procesados = dict(_resultados_pdfs(
+        pdf_files, args, directorio_cache, metricas, executor, huellas, resumen['omitidos'],
+        None if args.sin_cache else pdfs_anteriores, ya_fusionados, resumen['fallidos']))
+    if ya_fusionados:
+        print(f"✓ {len(ya_fusionados)} PDFs ya incorporados a '{NOMBRE_SALIDA}': no se han vuelto a leer\n")
+
+    # Un PDF nuevo de la misma materia y período que uno ya incorporado obliga a
+    # leer también este, para fusionarlos en el mismo orden que si se leyeran todos
+    repetir = pdfs_a_releer(ya_fusionados, procesados)
+    if repetir:
+        procesados.update(_resultados_pdfs(repetir, args, directorio_cache, metricas,
+                                           executor, huellas, resumen['omitidos']))
+    resultados = [procesados[pdf_path] for pdf_path in pdf_files if pdf_path in procesados]
+    archivos_procesados = resumen['procesados'] = len(resultados) + len(ya_fusionados) - len(repetir)
+
+    pdfs_fusionados = dict(pdfs_anteriores)
+    anotar_incorporados(pdfs_fusionados, {
+        clave_cache(huellas[pdf_path], args.motor): [normalizar_nombre_hoja(materia), periodo]
+        for pdf_path, (materia, periodo, _) in procesados.items() if pdf_path in huellas})
+
+    # Agrupar por hoja y construir cada una de una vez, con los períodos en orden cronológico
+    with _medir(metricas, 'fusion'):
+        fusionar_plan(hojas_fusionadas, planificar_fusion(resultados))
 
     if not hojas_fusionadas:
         print("⚠ No se pudo procesar ningún archivo")
-        return
+        resumen['estado'] = 'sin_datos'
+        return resumen
+    resumen['hojas'] = len(hojas_fusionadas)
+
+    hojas_modificadas = sum(1 for hoja in hojas_fusionadas.values() if hoja.modificada)
+    with _medir(metricas, 'resumen'):
+        xml_resumen = xml_resumen_libro(hojas_fusionadas, args)
+    if hojas_existentes and not hojas_modificadas and xml_resumen == xml_resumen_anterior:
+        print(f"✓ Los datos de '{NOMBRE_SALIDA}' ya estaban al día: no es necesario reescribirlo")
+        print(f"  - {archivos_procesados}/{len(pdf_files)} archivos procesados")
+        _exportar(directorio, args, lambda: hojas_fusionadas, metricas)
+        guardar_firma()
+        resumen['estado'] = 'al_dia'
+        return resumen
 
     # Crear el archivo ODS
     print("=" * 70)
     print(f"Creando archivo ODS: {NOMBRE_SALIDA}")
     print("=" * 70)
-    crear_ods(hojas_fusionadas, NOMBRE_SALIDA)
+    with _medir(metricas, 'escritura_ods'):
+        crear_ods(hojas_fusionadas, archivo_ods, xml_resumen=xml_resumen,
+                  pdfs_fusionados=pdfs_fusionados)
+    _exportar(directorio, args, lambda: hojas_fusionadas, metricas)
+    guardar_firma()
+
+    print(f"\n✓ Archivo '{NOMBRE_SALIDA}' creado exitosamente!")
+    print(f"  - {len(hojas_fusionadas)} hojas en total ({hojas_modificadas} actualizadas)")
+    print(f"  - {archivos_procesados}/{len(pdf_files)} archivos procesados")
+    print(f"\nPuedes abrirlo con LibreOffice Calc, Excel u otro programa de hojas de cálculo.")
+    resumen['estado'] = 'escrito'
+    return resumen
+
+# Por qué no se ha podido incorporar un PDF, según su estado en procesar_pdfs()
+MOTIVOS_FALLO = {
+    'error': "no se pudo leer o no tiene datos de faltas",
+    'descartado': "no es un informe de faltas de Raíces",
+}
+
+def _resultados_pdfs(pdf_files, args, directorio_cache=None, metricas=None, executor=None,
+                     hashes=None, omitidos=None, incorporados=None, ya_incorporados=None,
+                     fallidos=None):
+    """Procesa los PDFs y devuelve [(pdf, (materia, periodo, datos))] de los que se leyeron bien
+
+    Los PDFs que superan los límites de args.limites se añaden a omitidos, y los
+    que no tienen datos (o no son informes), a fallidos, como (nombre, motivo).
+    Los que ya están en incorporados (el modelo del ODS, ver procesar_pdfs())
+    no se leen y se anotan en ya_incorporados como {pdf: (hoja, periodo)}.
+    """
+    if executor is None and args.procesos and args.procesos > 1:
+        print(f"Procesando en paralelo con {args.procesos} procesos\n")
+
+    resultados = []
+    with _medir(metricas, 'procesado_pdfs'):
+        for pdf_path, (nombre_materia, periodo, datos), estado in procesar_pdfs(
+                pdf_files, args.procesos, directorio_cache, metricas, args.motor, executor,
+                hashes, args.limites, omitidos, not args.sin_filtro, incorporados):
+            if estado == 'incorporado':
+                if ya_incorporados is not None:
+                    ya_incorporados[pdf_path] = (nombre_materia, periodo)
+                continue
+            if nombre_materia and periodo and datos:
+                resultados.append((pdf_path, (nombre_materia, periodo, datos)))
+            elif fallidos is not None and estado in MOTIVOS_FALLO:
+                fallidos.append((nombre_pdf(pdf_path), MOTIVOS_FALLO[estado]))
+            print()
+    return resultados
+
+def generar_desde_bd(directorio, pdf_files, archivo_ods, args, directorio_cache, metricas,
+                     executor, guardar_firma, resumen):
+    """Variante de generar_directorio() con la base de datos SQLite como almacén (--bd).
+
+    Los PDFs se guardan en la base de datos con upserts en una sola transacción
+    y el ODS se genera a partir de ella hoja a hoja, sin volver a leerlo. La
+    primera vez, si ya existía un ODS, se importan sus datos. guardar_firma anota
+    la ejecución para el camino rápido.
+    """
+    ruta_bd = directorio / args.bd
+    conexion = abrir_bd(ruta_bd)
+    try:
+        if not contar_hojas_bd(conexion):
+            with _medir(metricas, 'lectura_ods'):
+                hojas_existentes = cargar_hojas_existentes(archivo_ods)[0]
+            if hojas_existentes:
+                importar_ods_a_bd(conexion, hojas_existentes)
+                print(f"✓ Importadas {len(hojas_existentes)} hojas de '{NOMBRE_SALIDA}' "
+                      f"a la base de datos {ruta_bd.name}\n")
+        else:
+            print(f"✓ Base de datos encontrada: {ruta_bd.name} ({contar_hojas_bd(conexion)} hojas)\n")
+
+        resultados = [resultado for _, resultado in
+                      _resultados_pdfs(pdf_files, args, directorio_cache, metricas, executor,
+                                       omitidos=resumen['omitidos'],
+                                       fallidos=resumen['fallidos'])]
+        archivos_procesados = resumen['procesados'] = len(resultados)
+
+        with _medir(metricas, 'fusion'):
+            cambios = guardar_en_bd(conexion, resultados)
+
+        num_hojas = resumen['hojas'] = contar_hojas_bd(conexion)
+        if not num_hojas:
+            print("⚠ No se pudo procesar ningún archivo")
+            resumen['estado'] = 'sin_datos'
+            return resumen
+
+        with _medir(metricas, 'resumen'):
+            xml_resumen = xml_resumen_libro(hojas_desde_bd(conexion), args, num_hojas)
+        # Sin registros nuevos el ODS solo se reescribe si cambia el resumen (por
+        # ejemplo, porque se han cambiado los umbrales)
+        if (not cambios and archivo_ods.exists()
+                and leer_xml_hojas(archivo_ods).get(NOMBRE_HOJA_RESUMEN) == xml_resumen):
+            print(f"✓ Los datos de '{NOMBRE_SALIDA}' ya estaban al día: no es necesario reescribirlo")
+            print(f"  - {archivos_procesados}/{len(pdf_files)} archivos procesados")
+            _exportar(directorio, args, lambda: hojas_desde_bd(conexion), metricas)
+            guardar_firma()
+            resumen['estado'] = 'al_dia'
+            return resumen
+
+        print("=" * 70)
+        print(f"Creando archivo ODS: {NOMBRE_SALIDA} (desde {ruta_bd.name})")
+        print("=" * 70)
+        with _medir(metricas, 'escritura_ods'):
+            crear_ods(hojas_desde_bd(conexion), archivo_ods, xml_resumen=xml_resumen)
+        _exportar(directorio, args, lambda: hojas_desde_bd(conexion), metricas)
+    finally:
+        conexion.close()
+
+    guardar_firma()
 
     print(f"\n✓ Archivo '{NOMBRE_SALIDA}' creado exitosamente!")
-    print(f"  - {len(hojas_fusionadas)} hojas en total")
+    print(f"  - {num_hojas} hojas en total ({cambios} registros nuevos o actualizados)")
     print(f"  - {archivos_procesados}/{len(pdf_files)} archivos procesados")
     print(f"\nPuedes abrirlo con LibreOffice Calc, Excel u otro programa de hojas de cálculo.")
+    resumen['estado'] = 'escrito'
+    return resumen
+
+def consultar(args):
+    """Muestra los recuentos guardados en la base de datos de un alumno o de un período"""
+    ruta_bd = Path(args.bd)
+    if not ruta_bd.exists():
+        print(f"⚠ No existe la base de datos {ruta_bd}")
+        return False
+
+    conexion = abrir_bd(ruta_bd)
+    try:
+        if args.consultar_alumno:
+            filas = sorted(consultar_alumno(conexion, args.consultar_alumno),
+                           key=lambda f: (f[0], clave_periodo(f[1]), f[1]))
+            titulo = f"Faltas de {args.consultar_alumno}"
+        else:
+            filas = sorted(consultar_periodo(conexion, args.consultar_periodo),
+                           key=lambda f: (f[0], f[1]))
+            titulo = f"Faltas del período {args.consultar_periodo}"
+    finally:
+        conexion.close()
+
+    print(titulo)
+    if not filas:
+        print("  (sin registros)")
+        return True
+    print(f"  {'Hoja':<31}  {'Período / Alumno':<40} {'Just.':>5} {'Inj.':>5} {'Retr.':>5}")
+    for hoja, clave, fj, fi, r in filas:
+        valores = ''.join(f" {'' if v is None else v:>5}" for v in (fj, fi, r))
+        print(f"  {hoja:<31}  {clave:<40}{valores}")
+    return True
+
+def directorios_lote(rutas):
+    """Directorios con PDFs bajo las rutas indicadas (incluidas), sin entrar en los ocultos"""
+    directorios = []
+    for ruta in rutas:
+        ruta = Path(ruta).resolve()
+        if not ruta.is_dir():
+            print(f"⚠ No es un directorio: {ruta}")
+            continue
+        for raiz, subdirectorios, archivos in os.walk(ruta):
+            # Recorrer en orden y saltar la caché y otras carpetas ocultas
+            subdirectorios[:] = sorted(d for d in subdirectorios if not d.startswith('.'))
+            directorio = Path(raiz)
+            if directorio not in directorios and any(a.endswith('.pdf') for a in archivos):
+                directorios.append(directorio)
+    return directorios
+
+def archivo_estado_lote(directorio):
+    """Nombre del archivo de firma de un directorio cuando la caché es compartida"""
+    identificador = hashlib.sha256(str(directorio).encode('utf-8')).hexdigest()[:16]
+    return f"ultima_ejecucion.{identificador}.estado"
+
+# Cómo se muestra cada estado de generar_directorio() en el resumen del modo lote
+ESTADOS_LOTE = {
+    'escrito': "ODS actualizado",
+    'al_dia': "ya estaba al día",
+    'sin_cambios': "sin cambios",
+    'sin_pdfs': "sin PDFs",
+    'sin_datos': "ningún PDF válido",
+}
+
+def generar_lote(args, metricas=None):
+    """Crea o actualiza un ODS en cada directorio con PDFs de las rutas de args.lote.
+
+    Todos los directorios comparten la caché de extracciones y, con -j, un
+    único pool de procesos, así que el intérprete, las importaciones y los
+    trabajadores se preparan una sola vez. Un error en un directorio no detiene
+    los demás. Devuelve True si todos terminaron sin errores.
+    """
+    print("=" * 70)
+    print("Generador de archivo ODS desde PDFs de faltas (modo lote)")
+    print("=" * 70)
+    print()
+
+    directorios = directorios_lote(args.lote)
+    if not directorios:
+        print("⚠ No se encontraron directorios con archivos PDF")
+        return False
+    print(f"Encontrados {len(directorios)} directorios con PDFs\n")
+
+    directorio_cache = None if args.sin_cache else Path(args.cache).resolve()
+    executor = crear_pool(args.procesos, args.limites)
+    if args.procesos and args.procesos > 1:
+        print(f"Procesando en paralelo con {args.procesos} procesos\n")
+
+    resumenes = []
+    try:
+        for directorio in directorios:
+            print("=" * 70)
+            print(f"Directorio: {directorio}")
+            print("=" * 70)
+            try:
+                resumen = generar_directorio(directorio, args, directorio_cache, metricas,
+                                             executor, archivo_estado_lote(directorio))
+            except Exception as e:
+                print(f"⚠ Error al procesar el directorio: {e}")
+                resumen = {'estado': 'error', 'error': str(e)}
+            resumenes.append((directorio, resumen))
+            print()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if directorio_cache:
+        podar_cache(directorio_cache, args.cache_max_mb)
+
+    mostrar_resumen_lote(resumenes)
+    return all(resumen['estado'] != 'error' for _, resumen in resumenes)
+
+def mostrar_resumen_lote(resumenes):
+    """Imprime una línea por directorio con el resultado y los PDFs que fallaron"""
+    print("=" * 70)
+    print("Resumen del lote")
+    print("=" * 70)
+    for directorio, resumen in resumenes:
+        if resumen['estado'] == 'error':
+            print(f"⚠ {directorio}: error ({resumen['error']})")
+            continue
+        fallidos = resumen['pdfs'] - resumen['procesados']
+        if resumen['estado'] == 'sin_cambios':
+            detalle = f"{resumen['pdfs']} PDFs"
+        else:
+            detalle = f"{resumen['procesados']}/{resumen['pdfs']} PDFs procesados, {resumen['hojas']} hojas"
+        correcto = resumen['estado'] in ('escrito', 'al_dia', 'sin_cambios') and not fallidos
+        print(f"{'✓' if correcto else '⚠'} {directorio}: {ESTADOS_LOTE[resumen['estado']]} ({detalle})")
+        for nombre, motivo in resumen.get('omitidos', ()):
+            print(f"    - omitido {nombre}: {motivo}")
+        for nombre, motivo in resumen.get('fallidos', ()):
+            print(f"    - no incorporado {nombre}: {motivo}")
+
+    errores = sum(1 for _, resumen in resumenes if resumen['estado'] == 'error')
+    print(f"\n{len(resumenes) - errores}/{len(resumenes)} directorios completados"
+          + (f", {errores} con errores" if errores else ""))
+
+def _firmas_pdfs(directorio):
+    """{ruta: (tamaño, fecha de modificación)} de los PDFs de un directorio"""
+    firmas = {}
+    for pdf_path in sorted(directorio.glob("*.pdf")):
+        try:
+            estado = pdf_path.stat()
+        except OSError:
+            # Borrado entre el listado y la consulta
+            continue
+        firmas[pdf_path] = (estado.st_size, estado.st_mtime_ns)
+    return firmas
+
+def vigilar(args, metricas=None):
+    """Vigila el directorio actual e incorpora los PDFs nuevos o modificados según llegan.
+
+    Las hojas se mantienen en memoria entre comprobaciones, así que cada PDF nuevo
+    solo cuesta su propia extracción y la fusión de sus filas. Un PDF se procesa
+    cuando su tamaño y fecha no han cambiado entre dos comprobaciones (para no
+    leerlo mientras aún se está copiando). El ODS se reescribe cuando pasan
+    args.espera segundos sin cambios nuevos, y siempre de forma atómica, con
+    el modelo de los PDFs incorporados: estos no se vuelven a leer ni al
+    reanudar la vigilancia ni en una ejecución normal posterior.
+    """
+    directorio_actual = Path.cwd()
+    archivo_ods = directorio_actual / NOMBRE_SALIDA
+    directorio_cache = None if args.sin_cache else directorio_actual / args.cache
+
+    print("=" * 70)
+    print("Generador de archivo ODS desde PDFs de faltas (modo vigilancia)")
+    print("=" * 70)
+    print()
+
+    with _medir(metricas, 'lectura_ods'):
+        hojas, _, pdfs_fusionados = cargar_hojas_existentes(archivo_ods)
+    hojas = hojas or {}
+    pdfs_fusionados = dict(pdfs_fusionados)
+    if hojas:
+        print(f"✓ Archivo existente cargado: {NOMBRE_SALIDA} ({len(hojas)} hojas)")
+    print(f"Vigilando {directorio_actual} cada {args.intervalo:g} s (Ctrl+C para terminar)\n")
+
+    procesados = {}
+    firmas_anteriores = {}
+    cambios_desde = None
+    # Un solo pool para toda la vigilancia, como en --lote
+    executor = crear_pool(args.procesos, args.limites)
+
+    def escribir():
+        print("=" * 70)
+        print(f"Actualizando archivo ODS: {NOMBRE_SALIDA}")
+        print("=" * 70)
+        with _medir(metricas, 'escritura_ods'):
+            crear_ods(hojas, archivo_ods, conservar_xml=True,
+                      xml_resumen=xml_resumen_libro(hojas, args),
+                      pdfs_fusionados=pdfs_fusionados)
+        print(f"✓ Archivo '{NOMBRE_SALIDA}' actualizado ({len(hojas)} hojas)")
+        _exportar(directorio_actual, args, lambda: hojas, metricas)
+        print()
+
+    try:
+        while True:
+            firmas = _firmas_pdfs(directorio_actual)
+            listos = [pdf_path for pdf_path, firma in firmas.items()
+                      if procesados.get(pdf_path) != firma
+                      and firmas_anteriores.get(pdf_path) == firma]
+            firmas_anteriores = firmas
+
+            if listos:
+                leidos = {}
+                ya_incorporados = {}
+                huellas = {}
+                incorporados = None if args.sin_cache else dict(pdfs_fusionados)
+                with _medir(metricas, 'procesado_pdfs'):
+                    for pdf_path, resultado, estado in procesar_pdfs(
+                            listos, args.procesos, directorio_cache, metricas, args.motor,
+                            executor, huellas, args.limites, filtrar=not args.sin_filtro,
+                            incorporados=incorporados):
+                        procesados[pdf_path] = firmas[pdf_path]
+                        if estado == 'incorporado':
+                            ya_incorporados[pdf_path] = resultado[:2]
+                            continue
+                        if all(resultado):
+                            leidos[pdf_path] = resultado
+                        print()
+                    # Como en una ejecución normal, los incorporados de la misma
+                    # materia y período que uno nuevo se vuelven a leer
+                    for pdf_path, resultado, _ in procesar_pdfs(
+                            pdfs_a_releer(ya_incorporados, leidos), args.procesos,
+                            directorio_cache, metricas, args.motor, executor, huellas,
+                            args.limites, filtrar=not args.sin_filtro):
+                        if all(resultado):
+                            leidos[pdf_path] = resultado
+                        print()
+                resultados = [leidos[pdf_path] for pdf_path in listos if pdf_path in leidos]
+                anotar_incorporados(pdfs_fusionados, {
+                    clave_cache(huellas[pdf_path], args.motor): [
+                        normalizar_nombre_hoja(resultado[0]), resultado[1]]
+                    for pdf_path, resultado in leidos.items() if pdf_path in huellas})
+
+                with _medir(metricas, 'fusion'):
+                    fusionar_plan(hojas, planificar_fusion(resultados))
+                if directorio_cache:
+                    podar_cache(directorio_cache, args.cache_max_mb)
+
+                if any(hoja.modificada for hoja in hojas.values()):
+                    cambios_desde = time.monotonic()
+
+            if cambios_desde is not None and time.monotonic() - cambios_desde >= args.espera:
+                escribir()
+                cambios_desde = None
+
+            time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        print("\nDeteniendo la vigilancia...")
+        if cambios_desde is not None:
+            escribir()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+# Modo servicio (--servir): un servidor HTTP local que mantiene cargados el motor
+# de extracción, los procesos trabajadores y las hojas de cada libro entre peticiones
+
+def archivos_peticion(cuerpo, nombre=None):
+    """PDFs recibidos en una petición: el cuerpo es un PDF o un ZIP con PDFs.
+
+    Devuelve una lista de io.BytesIO con su nombre (el de los miembros del ZIP
+    va precedido de nombre). Lanza ValueError si el cuerpo no es ninguna de las dos cosas.
+    """
+    import zipfile
+
+    if cuerpo.startswith(b'%PDF'):
+        archivo = io.BytesIO(cuerpo)
+        archivo.name = nombre or "subida.pdf"
+        return [archivo]
+
+    if not cuerpo.startswith(b'PK'):
+        raise ValueError("el cuerpo de la petición debe ser un PDF o un ZIP con PDFs")
+    archivos = []
+    try:
+        with zipfile.ZipFile(io.BytesIO(cuerpo)) as zf:
+            for info in sorted(zf.infolist(), key=lambda i: i.filename):
+                if es_pdf_en_zip(info):
+                    archivo = io.BytesIO(zf.read(info))
+                    archivo.name = f"{nombre or 'subida.zip'}/{info.filename}"
+                    archivos.append(archivo)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"ZIP no válido: {e}") from e
+    return archivos
+
+class ServicioFaltas:
+    """Estado del modo servicio: libros cargados, cerrojos y pool de procesos.
+
+    Cada libro es un subdirectorio de raiz con su propio ODS. Sus hojas se quedan
+    en memoria después de la primera petición y solo se vuelven a leer si el ODS
+    cambia por fuera del servicio. Las peticiones de un mismo libro se atienden
+    de una en una (un cerrojo por libro) y las de libros distintos en paralelo,
+    hasta TRABAJOS_SIMULTANEOS; el resto esperan su turno en cola.
+    """
+
+    def __init__(self, args, raiz, executor=None):
+        import threading
+
+        self.args = args
+        self.raiz = Path(raiz)
+        self.executor = executor
+        self.directorio_cache = None if args.sin_cache else self.raiz / args.cache
+        self.libros = {}
+        self.en_cola = 0
+        self.en_curso = 0
+        self._nuevo_cerrojo = threading.Lock
+        self._cerrojos = {}
+        self._cerrojo_contadores = threading.Lock()
+        self._trabajos = threading.BoundedSemaphore(TRABAJOS_SIMULTANEOS)
+
+    @staticmethod
+    def nombre_valido(nombre):
+        """True si el nombre de libro sirve como subdirectorio (sin rutas ni nombres ocultos)"""
+        return re.fullmatch(r'\w[\w .-]*', nombre) is not None
+
+    def archivo_ods(self, nombre):
+        """Ruta del ODS de un libro"""
+        return self.raiz / nombre / NOMBRE_SALIDA
+
+    @contextlib.contextmanager
+    def turno(self, nombre):
+        """Espera el cerrojo del libro y un hueco entre los trabajos simultáneos.
+
+        El cerrojo del libro se toma primero, para que las peticiones en cola de
+        un libro no ocupen los huecos de los demás.
+        """
+        with self._cerrojo_contadores:
+            cerrojo = self._cerrojos.setdefault(nombre, self._nuevo_cerrojo())
+            self.en_cola += 1
+        with cerrojo, self._trabajos:
+            with self._cerrojo_contadores:
+                self.en_cola -= 1
+                self.en_curso += 1
+            try:
+                yield
+            finally:
+                with self._cerrojo_contadores:
+                    self.en_curso -= 1
+
+    def cargar(self, nombre):
+        """Libro en memoria, leyéndolo del ODS la primera vez o si ha cambiado desde entonces"""
+        archivo_ods = self.archivo_ods(nombre)
+        try:
+            firma = _firma_archivo(archivo_ods)
+        except OSError:
+            firma = None
+        libro = self.libros.get(nombre)
+        if libro is None or libro['firma'] != firma:
+            hojas, xml_resumen, pdfs = (cargar_hojas_existentes(archivo_ods) if firma
+                                        else (None, None, {}))
+            libro = {'hojas': hojas or {}, 'xml_resumen': xml_resumen,
+                     'pdfs': dict(pdfs), 'firma': firma}
+            self.libros[nombre] = libro
+        return libro
+
+    def resumen(self, nombre):
+        """Resumen de un libro: sus hojas con los períodos y el número de alumnos"""
+        libro = self.cargar(nombre)
+        return {
+            'libro': nombre,
+            'hojas': [{'materia': nombre_hoja, 'periodos': list(hoja.periodos),
+                       'alumnos': len(hoja.alumnos)}
+                      for nombre_hoja, hoja in libro['hojas'].items()],
+            'pdfs_incorporados': len(libro['pdfs']),
+        }
+
+    def estado(self):
+        """Estado del servicio: libros disponibles, cargados en memoria y en cola"""
+        libros = sorted(directorio.name for directorio in self.raiz.iterdir()
+                        if (directorio / NOMBRE_SALIDA).exists())
+        return {'libros': libros, 'cargados': sorted(self.libros),
+                'en_curso': self.en_curso, 'en_cola': self.en_cola}
+
+    def procesar(self, nombre, archivos):
+        """Incorpora al libro los PDFs recibidos y devuelve el resumen de la petición.
+
+        Hay que llamarlo dentro de turno(nombre). Los PDFs que el libro ya tenía
+        (mismo contenido) no se vuelven a leer, y el ODS solo se reescribe si
+        cambian los datos o la hoja de resumen.
+        """
+        inicio = time.perf_counter()
+        directorio = self.raiz / nombre
+        libro = self.cargar(nombre)
+        try:
+            huellas = {}
+            leidos = {}
+            incorporados = {}
+            errores = []
+            descartados = []
+            omitidos = []
+
+            def procesar_archivos(archivos, incorporados_libro=None):
+                for archivo, resultado, estado_pdf in procesar_pdfs(
+                        archivos, self.args.procesos, self.directorio_cache,
+                        motor=self.args.motor, executor=self.executor, hashes=huellas,
+                        limites=self.args.limites, omitidos=omitidos,
+                        filtrar=not self.args.sin_filtro, incorporados=incorporados_libro):
+                    if estado_pdf == 'incorporado':
+                        incorporados[archivo] = resultado[:2]
+                    elif estado_pdf in ('leido', 'en_cache'):
+                        leidos[archivo] = resultado
+                    elif estado_pdf == 'descartado':
+                        descartados.append(nombre_pdf(archivo))
+                    elif estado_pdf == 'error':
+                        errores.append(nombre_pdf(archivo))
+
+            # Copia del modelo: los PDFs repetidos dentro de la misma subida se leen todos
+            procesar_archivos(archivos, dict(libro['pdfs']))
+            repetir = pdfs_a_releer(incorporados, leidos)
+            procesar_archivos(repetir)
+            ya_incorporados = len(incorporados) - len(repetir)
+            resultados = [leidos[archivo] for archivo in archivos if archivo in leidos]
+            anotar_incorporados(libro['pdfs'], {
+                clave_cache(huellas[archivo], self.args.motor): [
+                    normalizar_nombre_hoja(resultado[0]), resultado[1]]
+                for archivo, resultado in leidos.items()})
+
+            hojas = libro['hojas']
+            fusionar_plan(hojas, planificar_fusion(resultados))
+            xml_resumen = xml_resumen_libro(hojas, self.args)
+            if not hojas:
+                estado = 'sin_datos'
+            elif (any(hoja.modificada for hoja in hojas.values())
+                    or xml_resumen != libro['xml_resumen']):
+                directorio.mkdir(exist_ok=True)
+                crear_ods(hojas, self.archivo_ods(nombre), conservar_xml=True,
+                          xml_resumen=xml_resumen, pdfs_fusionados=libro['pdfs'])
+                _exportar(directorio, self.args, lambda: hojas)
+                libro['xml_resumen'] = xml_resumen
+                libro['firma'] = _firma_archivo(self.archivo_ods(nombre))
+                estado = 'escrito'
+            else:
+                estado = 'al_dia'
+        except BaseException:
+            # El libro en memoria puede haber quedado a medias: se volverá a leer del ODS
+            self.libros.pop(nombre, None)
+            raise
+
+        resumen = self.resumen(nombre)
+        resumen.update({
+            'estado': estado,
+            'recibidos': len(archivos),
+            'procesados': len(resultados),
+            'ya_incorporados': ya_incorporados,
+            'errores': errores,
+            'descartados': descartados,
+            'omitidos': [{'archivo': nombre, 'motivo': motivo} for nombre, motivo in omitidos],
+            'segundos': round(time.perf_counter() - inicio, 3),
+        })
+        return resumen
+
+class SalidaPorHilo(io.TextIOBase):
+    """Sustituye a sys.stdout en el modo servicio para que los mensajes de
+    peticiones simultáneas no se mezclen.
+
+    Lo que se escribe dentro de peticion() se guarda aparte para ese hilo y se
+    muestra de una vez, bajo una cabecera, cuando termina la petición; el resto
+    pasa directamente a la salida original.
+    """
+
+    def __init__(self, salida):
+        import threading
+
+        self.salida = salida
+        self._hilo = threading.local()
+        self._cerrojo = threading.Lock()
+
+    def writable(self):
+        return True
+
+    def write(self, texto):
+        registro = getattr(self._hilo, 'registro', None)
+        if registro is not None:
+            return registro.write(texto)
+        with self._cerrojo:
+            return self.salida.write(texto)
+
+    def flush(self):
+        with self._cerrojo:
+            self.salida.flush()
+
+    @contextlib.contextmanager
+    def peticion(self, cabecera):
+        """Agrupa los mensajes del hilo actual hasta el final del bloque"""
+        self._hilo.registro = io.StringIO()
+        try:
+            yield
+        finally:
+            texto = self._hilo.registro.getvalue()
+            self._hilo.registro = None
+            if texto:
+                with self._cerrojo:
+                    self.salida.write(f"--- {cabecera}\n{texto}")
+                    self.salida.flush()
+
+def servir(args):
+    """Modo servicio: atiende por HTTP lotes de PDFs para los libros del directorio actual.
+
+    Rutas (solo en 127.0.0.1):
+      GET  /               estado del servicio y libros disponibles (JSON)
+      GET  /libros/NOMBRE  resumen del libro (JSON), o el ODS con ?formato=ods
+      POST /libros/NOMBRE  incorpora los PDFs del cuerpo (un PDF o un ZIP con PDFs)
+                           y devuelve el resumen, o el ODS con ?formato=ods
+
+    El libro NOMBRE es el subdirectorio del mismo nombre, que se crea si no
+    existe. La cabecera X-Nombre-Archivo da nombre al archivo subido en los mensajes.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, unquote, urlsplit
+
+    print("=" * 70)
+    print("Generador de archivo ODS desde PDFs de faltas (modo servicio)")
+    print("=" * 70)
+    print()
+
+    precargar_motor()
+    executor = crear_pool(args.procesos, args.limites)
+    if args.procesos and args.procesos > 1:
+        print(f"Procesando en paralelo con {args.procesos} procesos")
+    servicio = ServicioFaltas(args, Path.cwd(), executor)
+
+    class Manejador(BaseHTTPRequestHandler):
+        def _responder(self, codigo, cuerpo, tipo="application/json; charset=utf-8",
+                       nombre_archivo=None):
+            if not isinstance(cuerpo, bytes):
+                cuerpo = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+            self.send_response(codigo)
+            self.send_header('Content-Type', tipo)
+            self.send_header('Content-Length', str(len(cuerpo)))
+            if nombre_archivo:
+                self.send_header('Content-Disposition', f'attachment; filename="{nombre_archivo}"')
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def _libro(self):
+            """(nombre del libro, formato) de la ruta, o (None, None) tras responder con el error"""
+            partes = urlsplit(self.path)
+            ruta = unquote(partes.path)
+            formato = parse_qs(partes.query).get('formato', ['json'])[0]
+            nombre = ruta[len('/libros/'):] if ruta.startswith('/libros/') else ''
+            if not servicio.nombre_valido(nombre):
+                self._responder(404, {'error': f"ruta no encontrada: {ruta}"})
+                return None, None
+            if formato not in ('json', 'ods'):
+                self._responder(400, {'error': f"formato no válido: {formato} (json u ods)"})
+                return None, None
+            return nombre, formato
+
+        def _enviar(self, nombre, formato, resumen):
+            if formato == 'ods' and servicio.archivo_ods(nombre).exists():
+                self._responder(200, servicio.archivo_ods(nombre).read_bytes(),
+                                'application/vnd.oasis.opendocument.spreadsheet', NOMBRE_SALIDA)
+            else:
+                self._responder(200, resumen)
+
+        def do_GET(self):
+            if urlsplit(self.path).path == '/':
+                self._responder(200, servicio.estado())
+                return
+            nombre, formato = self._libro()
+            if nombre is None:
+                return
+            with servicio.turno(nombre):
+                if not servicio.archivo_ods(nombre).exists():
+                    self._responder(404, {'error': f"el libro '{nombre}' no existe"})
+                    return
+                self._enviar(nombre, formato, servicio.resumen(nombre))
+
+        def do_POST(self):
+            nombre, formato = self._libro()
+            if nombre is None:
+                return
+            try:
+                longitud = int(self.headers['Content-Length'])
+            except (TypeError, ValueError):
+                self._responder(411, {'error': "falta la cabecera Content-Length"})
+                return
+            if longitud > TAMANO_MAXIMO_PETICION_MB * 1024 * 1024:
+                self._responder(413, {'error': f"la petición supera {TAMANO_MAXIMO_PETICION_MB} MB"})
+                return
+            try:
+                archivos = archivos_peticion(self.rfile.read(longitud),
+                                             self.headers.get('X-Nombre-Archivo'))
+            except ValueError as e:
+                self._responder(400, {'error': str(e)})
+                return
+
+            with salida.peticion(f"{time.strftime('%H:%M:%S')} POST /libros/{nombre}"), \
+                    servicio.turno(nombre):
+                try:
+                    resumen = servicio.procesar(nombre, archivos)
+                except Exception as e:
+                    print(f"⚠ Error al procesar el libro '{nombre}': {e}")
+                    self._responder(500, {'error': str(e)})
+                    return
+                self._enviar(nombre, formato, resumen)
+
+    servidor = ThreadingHTTPServer((HOST_SERVICIO, args.servir), Manejador)
+    servidor.daemon_threads = True
+    print(f"Atendiendo en http://{HOST_SERVICIO}:{servidor.server_port}/ los libros de "
+          f"{servicio.raiz} (Ctrl+C para terminar)\n")
+    salida = SalidaPorHilo(sys.stdout)
+    sys.stdout = salida
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDeteniendo el servicio...")
+    finally:
+        sys.stdout = salida.salida
+        servidor.server_close()
+        if executor is not None:
+            executor.shutdown()
+        if servicio.directorio_cache:
+            podar_cache(servicio.directorio_cache, args.cache_max_mb)
 
 if __name__ == "__main__":
     main()
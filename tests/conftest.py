@@ -0,0 +1,17 @@
+"""Configuración común de las pruebas: rutas de importación e informes sintéticos de Raíces"""
+import sys
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / 'benchmarks'))
+
+import generar_informes  # noqa: E402
+
+@pytest.fixture(scope='session')
+def informes(tmp_path_factory):
+    """PDFs sintéticos: 3 materias x 2 períodos, con tablas de más de una página"""
+    return generar_informes.generar_lote(tmp_path_factory.mktemp('informes'), materias=3,
+                                         alumnos=70, periodos=2, semilla=1)
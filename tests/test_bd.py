@@ -0,0 +1,53 @@
+"""Base de datos SQLite (--bd): guarda lo mismo que el ODS y las actualizaciones son upserts"""
+import copy
+import zipfile
+
+import pytest
+
+import generar_faltas_ods as gfo
+from generar_informes import generar_lote
+
+@pytest.fixture(scope='module')
+def resultados(tmp_path_factory):
+    """Análisis de 2 materias x 3 períodos con altas y bajas"""
+    pdfs = generar_lote(tmp_path_factory.mktemp('bd'), materias=2, alumnos=25, periodos=3,
+                        semilla=5, rotacion=0.4)
+    return [gfo.procesar_pdf(pdf) for pdf in pdfs]
+
+@pytest.fixture
+def conexion(tmp_path):
+    conexion = gfo.abrir_bd(tmp_path / 'faltas.sqlite')
+    yield conexion
+    conexion.close()
+
+def content_xml(ods):
+    with zipfile.ZipFile(ods) as zf:
+        return zf.read('content.xml')
+
+def test_el_ods_desde_la_bd_es_igual_que_el_directo(resultados, conexion, tmp_path):
+    gfo.guardar_en_bd(conexion, resultados)
+    gfo.crear_ods(gfo.hojas_desde_bd(conexion), tmp_path / 'desde_bd.ods')
+    gfo.crear_ods(gfo.fusionar_plan({}, gfo.planificar_fusion(resultados)), tmp_path / 'directo.ods')
+
+    assert content_xml(tmp_path / 'desde_bd.ods') == content_xml(tmp_path / 'directo.ods')
+
+def test_volver_a_guardar_solo_cambia_lo_distinto(resultados, conexion):
+    assert gfo.guardar_en_bd(conexion, resultados) > 0
+    assert gfo.guardar_en_bd(conexion, resultados) == 0
+
+    materia, periodo, datos = copy.deepcopy(resultados[0])
+    nombre = datos[0][0]
+    datos[0][1] = '99'
+    assert gfo.guardar_en_bd(conexion, [(materia, periodo, datos)]) == 1
+    hoja = gfo.normalizar_nombre_hoja(materia)
+    assert (hoja, periodo, 99, int(datos[0][2]), int(datos[0][3])) in gfo.consultar_alumno(conexion, nombre)
+
+def test_importar_un_ods_existente(resultados, conexion, tmp_path):
+    ods = tmp_path / gfo.NOMBRE_SALIDA
+    gfo.crear_ods(gfo.fusionar_plan({}, gfo.planificar_fusion(resultados)), ods)
+
+    gfo.importar_ods_a_bd(conexion, gfo.cargar_hojas_existentes(ods)[0])
+    gfo.crear_ods(gfo.hojas_desde_bd(conexion), tmp_path / 'desde_bd.ods')
+
+    assert gfo.contar_hojas_bd(conexion) == 2
+    assert content_xml(tmp_path / 'desde_bd.ods') == content_xml(ods)
@@ -0,0 +1,48 @@
+"""Caché de resultados por contenido del PDF: lo que se guarda se vuelve a leer igual"""
+import shutil
+
+import generar_faltas_ods as gfo
+from generar_informes import escribir_pdf
+
+def test_guardar_y_leer_devuelve_el_mismo_resultado(informes, tmp_path):
+    resultado = gfo.procesar_pdf(informes[0])
+    clave = gfo.clave_cache(gfo.hash_pdf(informes[0]))
+
+    gfo.guardar_cache(tmp_path, clave, resultado)
+
+    assert gfo.leer_cache(tmp_path, clave) == resultado
+    assert [ruta.name for ruta in tmp_path.iterdir()] == [f"{clave}.json"]
+
+def test_la_clave_depende_del_contenido_y_del_motor(informes, tmp_path):
+    copia = tmp_path / 'copia con otro nombre.pdf'
+    shutil.copy(informes[0], copia)
+
+    assert gfo.hash_pdf(copia) == gfo.hash_pdf(informes[0])
+    assert gfo.hash_pdf(informes[1]) != gfo.hash_pdf(informes[0])
+    assert (gfo.clave_cache(gfo.hash_pdf(copia), 'pdfminer')
+            != gfo.clave_cache(gfo.hash_pdf(copia), 'pdfplumber'))
+
+def test_entrada_de_otra_version_se_descarta(informes, tmp_path, monkeypatch):
+    clave = gfo.clave_cache(gfo.hash_pdf(informes[0]))
+    monkeypatch.setattr(gfo, 'VERSION_CACHE', gfo.VERSION_CACHE - 1)
+    gfo.guardar_cache(tmp_path, clave, gfo.procesar_pdf(informes[0]))
+    monkeypatch.undo()
+
+    assert gfo.leer_cache(tmp_path, clave) is None
+    assert not (tmp_path / f"{clave}.json").exists()
+
+def test_procesar_pdfs_usa_la_cache_en_la_segunda_ejecucion(informes, tmp_path):
+    circular = tmp_path / 'circular.pdf'
+    escribir_pdf([[(40, 800, 10, "Circular informativa para las familias")]], circular)
+    pdfs = [informes[0], circular, informes[1]]
+    cache = tmp_path / 'cache'
+
+    primera = list(gfo.procesar_pdfs(pdfs, directorio_cache=cache))
+    segunda = list(gfo.procesar_pdfs(pdfs, directorio_cache=cache))
+
+    assert [estado for _, _, estado in primera] == ['leido', 'descartado', 'leido']
+    assert [estado for _, _, estado in segunda] == ['en_cache', 'descartado', 'en_cache']
+    assert [resultado for _, resultado, _ in segunda] == [resultado for _, resultado, _ in primera]
+    # Sin filtro, el PDF descartado se vuelve a leer entero
+    assert [estado for _, _, estado in gfo.procesar_pdfs(pdfs, directorio_cache=cache,
+                                                         filtrar=False)] == ['en_cache', 'error', 'en_cache']
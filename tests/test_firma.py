@@ -0,0 +1,72 @@
+"""Camino rápido: la firma de la última ejecución detecta cuándo no hay nada que hacer"""
+import os
+import shutil
+
+import generar_faltas_ods as gfo
+
+def preparar(informes, tmp_path):
+    pdfs = []
+    for pdf in informes[:2]:
+        pdfs.append(tmp_path / pdf.name)
+        shutil.copy(pdf, pdfs[-1])
+    ods = tmp_path / gfo.NOMBRE_SALIDA
+    ods.write_bytes(b"ods")
+    return pdfs, ods, tmp_path / 'cache'
+
+def test_sin_cambios_tras_guardar_la_firma(informes, tmp_path):
+    pdfs, ods, cache = preparar(informes, tmp_path)
+    opciones = {'resumen': True, 'limites': None}
+
+    assert gfo.sin_cambios_desde_ultima_ejecucion(cache, pdfs, ods, opciones=opciones) is None
+    gfo.guardar_firma_ejecucion(cache, pdfs, ods, opciones=opciones)
+
+    assert gfo.sin_cambios_desde_ultima_ejecucion(cache, pdfs, ods, opciones=opciones) == []
+
+def test_cualquier_cambio_invalida_la_firma(informes, tmp_path):
+    pdfs, ods, cache = preparar(informes, tmp_path)
+    gfo.guardar_firma_ejecucion(cache, pdfs, ods, opciones={'resumen': True})
+
+    assert gfo.sin_cambios_desde_ultima_ejecucion(cache, pdfs, ods, opciones={'resumen': False}) is None
+    assert gfo.sin_cambios_desde_ultima_ejecucion(cache, pdfs[:1], ods, opciones={'resumen': True}) is None
+    os.utime(pdfs[0], ns=(0, 0))
+    assert gfo.sin_cambios_desde_ultima_ejecucion(cache, pdfs, ods, opciones={'resumen': True}) is None
+
+    gfo.guardar_firma_ejecucion(cache, pdfs, ods, opciones={'resumen': True})
+    ods.write_bytes(b"ods editado")
+    assert gfo.sin_cambios_desde_ultima_ejecucion(cache, pdfs, ods, opciones={'resumen': True}) is None
+
+def test_segunda_ejecucion_no_hace_nada(informes, tmp_path, monkeypatch, capsys):
+    _, ods, _ = preparar(informes, tmp_path)
+    ods.unlink()
+    monkeypatch.chdir(tmp_path)
+
+    gfo.main([])
+    escrito = ods.read_bytes()
+    capsys.readouterr()
+    gfo.main([])
+
+    assert "Nada que hacer" in capsys.readouterr().out
+    assert ods.read_bytes() == escrito
+
+def test_la_firma_recuerda_los_pdfs_fallidos(informes, tmp_path):
+    pdfs, ods, cache = preparar(informes, tmp_path)
+    fallidos = [('roto.pdf', "no se pudo leer o no tiene datos de faltas")]
+    gfo.guardar_firma_ejecucion(cache, pdfs, ods, fallidos=fallidos)
+
+    assert gfo.sin_cambios_desde_ultima_ejecucion(cache, pdfs, ods) == fallidos
+
+def test_el_lote_vuelve_a_avisar_de_los_fallidos_sin_cambios(informes, tmp_path, monkeypatch, capsys):
+    grupo = tmp_path / 'grupo'
+    grupo.mkdir()
+    preparar(informes, grupo)[1].unlink()
+    (grupo / 'roto.pdf').write_bytes(b"%PDF-1.4 roto")
+    monkeypatch.chdir(tmp_path)
+
+    gfo.main(['--lote', 'grupo'])
+    capsys.readouterr()
+    gfo.main(['--lote', 'grupo'])
+    salida = capsys.readouterr().out
+
+    linea = next(linea for linea in salida.splitlines() if "sin cambios" in linea)
+    assert linea.startswith("⚠")
+    assert "- no incorporado roto.pdf" in salida
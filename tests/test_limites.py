@@ -0,0 +1,40 @@
+"""Límites por PDF (--limite-*): trabajadores que se reutilizan y se matan si se pasan"""
+import os
+import time
+
+import pytest
+
+import generar_faltas_ods as gfo
+
+@pytest.mark.parametrize('motor', list(gfo.MOTORES_EXTRACCION))
+def test_el_limite_de_paginas_se_comprueba_al_abrir(informes, motor):
+    paginas = gfo.extraer_paginas_pdf(informes[0], motor=motor, limite_paginas=1)
+
+    with pytest.raises(gfo.LimiteSuperado, match="tiene 2 páginas"):
+        next(paginas)
+
+def test_los_trabajadores_se_reutilizan_hasta_que_se_mata_uno():
+    pool = gfo.PoolLimitado(1, {'segundos': 0.5})
+    try:
+        pid = pool.submit(os.getpid).result()
+        assert pool.submit(os.getpid).result() == pid
+
+        with pytest.raises(gfo.LimiteSuperado, match="tardó más de 0.5 s") as error:
+            pool.submit(time.sleep, 30).result(timeout=10)
+        assert error.value.segundos >= 0.5
+        assert pool.submit(os.getpid).result() != pid
+    finally:
+        pool.shutdown()
+
+def test_procesar_pdfs_omite_los_que_superan_los_limites(informes, tmp_path):
+    pequeno = tmp_path / 'pequeno.pdf'
+    from generar_informes import escribir_pdf, paginas_informe
+    escribir_pdf(paginas_informe("Música", "01/09/2025 - 30/09/2025", [("Gil Sanz, Noa", 1, 2, 3)]),
+                 pequeno)
+    omitidos = []
+
+    estados = [estado for _, _, estado in gfo.procesar_pdfs(
+        [informes[0], pequeno], procesos=2, limites={'paginas': 1}, omitidos=omitidos)]
+
+    assert estados == ['omitido', 'leido']
+    assert omitidos == [(informes[0].name, "tiene 2 páginas (el límite es 1)")]
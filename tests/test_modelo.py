@@ -0,0 +1,116 @@
+"""Modelo guardado dentro del ODS: se recarga igual y se descarta si la hoja se ha editado"""
+import shutil
+import zipfile
+
+import pytest
+
+import generar_faltas_ods as gfo
+from generar_informes import escribir_pdf, paginas_informe
+
+@pytest.fixture
+def ods(informes, tmp_path):
+    """ODS con los informes sintéticos y el hash de cada PDF fusionado"""
+    resultados = [gfo.procesar_pdf(pdf) for pdf in informes]
+    pdfs = {gfo.hash_pdf(pdf): [gfo.normalizar_nombre_hoja(materia), periodo]
+            for pdf, (materia, periodo, _) in zip(informes, resultados)}
+    ods = tmp_path / gfo.NOMBRE_SALIDA
+    gfo.crear_ods(gfo.fusionar_plan({}, gfo.planificar_fusion(resultados)), ods,
+                  pdfs_fusionados=pdfs)
+    return ods, pdfs
+
+def content_xml(ods):
+    with zipfile.ZipFile(ods) as zf:
+        return zf.read('content.xml')
+
+def test_el_modelo_se_recarga_igual(ods, tmp_path):
+    ods, pdfs = ods
+    hojas, _, pdfs_leidos = gfo.leer_modelo_ods(ods)
+    for hoja in hojas.values():
+        hoja.modificada = True
+        hoja.xml_original = None
+    gfo.crear_ods(hojas, tmp_path / 'copia.ods')
+
+    assert pdfs_leidos == pdfs
+    assert content_xml(tmp_path / 'copia.ods') == content_xml(ods)
+
+def test_el_modelo_se_descarta_si_se_edita_la_hoja(ods, tmp_path):
+    ods, _ = ods
+    editado = tmp_path / 'editado.ods'
+    with zipfile.ZipFile(ods) as origen, zipfile.ZipFile(editado, 'w') as destino:
+        for info in origen.infolist():
+            datos = origen.read(info)
+            if info.filename == 'content.xml':
+                # Como si se hubiera corregido a mano una falta de la hoja
+                assert b'office:value="1"' in datos
+                datos = datos.replace(b'office:value="1"', b'office:value="7"', 1)
+            destino.writestr(info, datos)
+
+    assert gfo.leer_modelo_ods(editado) is None
+    hojas, _, pdfs = gfo.cargar_hojas_existentes(editado)
+    assert sorted(hojas) == sorted(gfo.leer_modelo_ods(ods)[0])
+    assert pdfs == {}
+
+def test_los_pdfs_incorporados_no_se_vuelven_a_leer(informes, tmp_path, monkeypatch, capsys):
+    for pdf in informes:
+        shutil.copy(pdf, tmp_path)
+    monkeypatch.chdir(tmp_path)
+    gfo.main(['--sin-resumen'])
+    capsys.readouterr()
+
+    # Sin caché ni firma de la última ejecución, solo queda el modelo del ODS
+    shutil.rmtree(tmp_path / gfo.DIRECTORIO_CACHE)
+    (tmp_path / informes[0].name).touch()
+    gfo.main(['--sin-resumen'])
+    salida = capsys.readouterr().out
+
+    assert f"✓ {len(informes)} PDFs ya incorporados" in salida
+    assert "Procesando:" not in salida
+
+def test_al_cambiar_de_motor_se_vuelven_a_leer(informes, tmp_path, monkeypatch, capsys):
+    for pdf in informes:
+        shutil.copy(pdf, tmp_path)
+    monkeypatch.chdir(tmp_path)
+    gfo.main(['--sin-resumen', '--motor', 'pdfminer'])
+    capsys.readouterr()
+
+    gfo.main(['--sin-resumen'])
+    salida = capsys.readouterr().out
+
+    assert "Nada que hacer" not in salida
+    assert "ya incorporados" not in salida
+    assert salida.count("Procesando:") == len(informes)
+
+def test_un_pdf_sobrescrito_se_vuelve_a_leer_si_vuelve(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+
+    def faltas(valor):
+        escribir_pdf(paginas_informe("Música", "01/09/2025 - 30/09/2025",
+                                     [("Gil Sanz, Noa", valor, valor, valor)]), tmp_path / 'a.pdf')
+        gfo.main(['--sin-resumen'])
+        tabla = gfo.leer_ods_existente(tmp_path / gfo.NOMBRE_SALIDA)["Música"]
+        return tabla['alumnos']["Gil Sanz, Noa"]
+
+    assert faltas(1) == ['1', '1', '1']
+    assert faltas(9) == ['9', '9', '9']
+    # La versión corregida sobrescribió a la original: si esta vuelve, hay que leerla
+    capsys.readouterr()
+    assert faltas(1) == ['1', '1', '1']
+    assert "ya incorporados" not in capsys.readouterr().out
+
+def test_la_vigilancia_conserva_los_pdfs_incorporados(informes, tmp_path, monkeypatch):
+    for pdf in informes:
+        shutil.copy(pdf, tmp_path)
+    monkeypatch.chdir(tmp_path)
+    esperas = []
+
+    def esperar(segundos):
+        # La primera comprobación ve los PDFs y la segunda los procesa y escribe el ODS
+        esperas.append(segundos)
+        if len(esperas) == 2:
+            raise KeyboardInterrupt
+    monkeypatch.setattr(gfo.time, 'sleep', esperar)
+
+    gfo.main(['--vigilar', '--intervalo', '0', '--espera', '0'])
+
+    assert set(gfo.leer_modelo_ods(tmp_path / gfo.NOMBRE_SALIDA)[2]) == {gfo.hash_pdf(pdf)
+                                                                         for pdf in informes}
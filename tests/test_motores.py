@@ -0,0 +1,41 @@
+"""Los motores de extracción alternativos tienen que dar el mismo análisis que el
+de referencia (pdfplumber) en los informes sintéticos de Raíces"""
+import pytest
+
+import generar_faltas_ods as gfo
+from generar_informes import escribir_pdf, paginas_informe
+
+MOTORES_ALTERNATIVOS = [motor for motor in gfo.MOTORES_EXTRACCION if motor != gfo.MOTOR_POR_DEFECTO]
+
+def analizar(pdf, motor):
+    return gfo.analizar_lineas(gfo.extraer_lineas_pdf(pdf, motor=motor))
+
+@pytest.mark.parametrize('motor', MOTORES_ALTERNATIVOS)
+def test_mismo_analisis_en_informes_de_varias_paginas(informes, motor):
+    for pdf in informes:
+        referencia = analizar(pdf, gfo.MOTOR_POR_DEFECTO)
+        assert all(referencia), pdf.name
+        assert len(referencia[2]) > 50, pdf.name
+        assert analizar(pdf, motor) == referencia, pdf.name
+
+@pytest.mark.parametrize('motor', MOTORES_ALTERNATIVOS)
+def test_mismo_analisis_con_acentos_y_comas(tmp_path, motor):
+    materia = "Educación Plástica, Visual y Audiovisual"
+    filas = [("Núñez Ortiz, Íñigo", 1, 0, 2), ("Muñoz Gil, Ángela", 0, 3, 0),
+             ("Álvarez Peña, José María", 12, 10, 1)]
+    pdf = tmp_path / 'acentos.pdf'
+    escribir_pdf(paginas_informe(materia, "01/09/2025 - 30/09/2025", filas), pdf)
+
+    referencia = analizar(pdf, gfo.MOTOR_POR_DEFECTO)
+    assert referencia[0] == materia
+    assert [fila[0] for fila in referencia[2]] == [fila[0] for fila in filas]
+    assert analizar(pdf, motor) == referencia
+
+@pytest.mark.parametrize('motor', list(gfo.MOTORES_EXTRACCION))
+def test_primera_pagina_distingue_informes(informes, tmp_path, motor):
+    circular = tmp_path / 'circular.pdf'
+    escribir_pdf([[(40, 800, 10, "Circular informativa para las familias"),
+                   (40, 780, 10, "Calendario de evaluaciones 2025/2026")]], circular)
+
+    assert gfo.es_informe(next(gfo.extraer_paginas_pdf(informes[0], motor=motor)))
+    assert not gfo.es_informe(next(gfo.extraer_paginas_pdf(circular, motor=motor)))
@@ -0,0 +1,50 @@
+"""Escritura y lectura del ODS: lo que escribe crear_ods() se vuelve a leer igual"""
+import zipfile
+
+import pytest
+
+import generar_faltas_ods as gfo
+from generar_informes import generar_lote
+
+@pytest.fixture(scope='module')
+def resultados(tmp_path_factory):
+    """Análisis de 2 materias x 4 períodos con altas y bajas (celdas vacías en las hojas)"""
+    pdfs = generar_lote(tmp_path_factory.mktemp('rotacion'), materias=2, alumnos=30, periodos=4,
+                        semilla=3, rotacion=0.4)
+    return [gfo.procesar_pdf(pdf) for pdf in pdfs]
+
+def content_xml(ods):
+    with zipfile.ZipFile(ods) as zf:
+        return zf.read('content.xml')
+
+def test_los_valores_de_los_pdfs_se_leen_del_ods(resultados, tmp_path):
+    ods = tmp_path / gfo.NOMBRE_SALIDA
+    gfo.crear_ods(gfo.fusionar_plan({}, gfo.planificar_fusion(resultados)), ods)
+
+    tablas = gfo.leer_ods_existente(ods)
+    for materia, periodo, datos in resultados:
+        tabla = tablas[gfo.normalizar_nombre_hoja(materia)]
+        columnas = [tabla['cabeceras'].index(f"{tipo} ({periodo})") - 1 for tipo in gfo.TIPOS_FALTA]
+        for nombre, *valores in datos:
+            assert [tabla['alumnos'][nombre][columna] for columna in columnas] == valores
+    # Los alumnos dados de baja o incorporados tarde dejan celdas vacías
+    assert any('' in valores for tabla in tablas.values() for valores in tabla['alumnos'].values())
+
+def test_leer_y_volver_a_escribir_da_el_mismo_contenido(resultados, tmp_path):
+    original = tmp_path / 'original.ods'
+    copia = tmp_path / 'copia.ods'
+    gfo.crear_ods(gfo.fusionar_plan({}, gfo.planificar_fusion(resultados)), original)
+
+    hojas = {nombre: gfo.HojaFaltas.desde_tabla(tabla)
+             for nombre, tabla in gfo.leer_ods_existente(original).items()}
+    gfo.crear_ods(hojas, copia)
+
+    assert content_xml(copia) == content_xml(original)
+
+def test_las_celdas_vacias_seguidas_se_agrupan(resultados, tmp_path):
+    ods = tmp_path / gfo.NOMBRE_SALIDA
+    gfo.crear_ods(gfo.fusionar_plan({}, gfo.planificar_fusion(resultados)), ods)
+
+    xml = content_xml(ods)
+    assert b'table:number-columns-repeated=' in xml
+    assert b'<table:table-cell/><table:table-cell/>' not in xml
@@ -0,0 +1,59 @@
+"""Modo servicio: peticiones simultáneas sin mezclar mensajes ni pisar la caché"""
+import io
+import threading
+
+import generar_faltas_ods as gfo
+
+def test_los_mensajes_de_cada_peticion_salen_juntos():
+    salida = io.StringIO()
+    hilos_salida = gfo.SalidaPorHilo(salida)
+    dentro = threading.Barrier(2)
+
+    def peticion(libro):
+        with hilos_salida.peticion(f"POST /libros/{libro}"):
+            hilos_salida.write(f"{libro}: 1\n")
+            dentro.wait()
+            hilos_salida.write(f"{libro}: 2\n")
+
+    hilos = [threading.Thread(target=peticion, args=(libro,)) for libro in ('A', 'B')]
+    hilos_salida.write("fuera de peticiones\n")
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    bloques = salida.getvalue().split('--- ')
+    assert bloques[0] == "fuera de peticiones\n"
+    assert sorted(bloques[1:]) == ["POST /libros/A\nA: 1\nA: 2\n", "POST /libros/B\nB: 1\nB: 2\n"]
+
+def test_guardar_el_mismo_pdf_a_la_vez_no_deja_temporales(informes, tmp_path):
+    resultado = gfo.procesar_pdf(informes[0])
+    clave = gfo.clave_cache(gfo.hash_pdf(informes[0]))
+    hilos = [threading.Thread(target=gfo.guardar_cache, args=(tmp_path, clave, resultado))
+             for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert [ruta.name for ruta in tmp_path.iterdir()] == [f"{clave}.json"]
+    assert gfo.leer_cache(tmp_path, clave) == resultado
+
+def test_un_pdf_sobrescrito_se_vuelve_a_leer_si_se_sube_otra_vez(tmp_path, monkeypatch):
+    from generar_informes import escribir_pdf, paginas_informe
+    monkeypatch.chdir(tmp_path)
+    servicio = gfo.ServicioFaltas(gfo.parsear_argumentos(['--sin-resumen']), tmp_path)
+
+    def subir(nombre, valor):
+        pdf = tmp_path / nombre
+        escribir_pdf(paginas_informe("Música", "01/09/2025 - 30/09/2025",
+                                     [("Gil Sanz, Noa", valor, valor, valor)]), pdf)
+        with servicio.turno('libro'):
+            resumen = servicio.procesar('libro', [pdf])
+        tabla = gfo.leer_ods_existente(servicio.archivo_ods('libro'))["Música"]
+        return resumen['ya_incorporados'], tabla['alumnos']["Gil Sanz, Noa"]
+
+    assert subir('a.pdf', 1) == (0, ['1', '1', '1'])
+    assert subir('b.pdf', 9) == (0, ['9', '9', '9'])
+    assert subir('c.pdf', 1) == (0, ['1', '1', '1'])
+    assert subir('d.pdf', 1) == (1, ['1', '1', '1'])
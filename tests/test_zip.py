@@ -0,0 +1,37 @@
+"""PDFs dentro de archivos ZIP (--zip): se identifican por su contenido y se leen una vez"""
+import collections
+import zipfile
+
+import generar_faltas_ods as gfo
+
+def comprimir(pdfs, destino):
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for pdf in pdfs:
+            zf.write(pdf, f"informes/{pdf.name}")
+    return destino
+
+def test_el_hash_de_un_miembro_es_el_de_su_contenido(informes, tmp_path):
+    miembros = gfo.miembros_zip([comprimir(informes[:2], tmp_path / 'informes.zip')])
+
+    assert [miembro.name for miembro in miembros] == [f"informes.zip/informes/{pdf.name}"
+                                                      for pdf in informes[:2]]
+    assert [gfo.hash_pdf(miembro) for miembro in miembros] == [gfo.hash_pdf(pdf)
+                                                               for pdf in informes[:2]]
+
+def test_cada_miembro_se_descomprime_una_sola_vez(informes, tmp_path, monkeypatch):
+    miembros = gfo.miembros_zip([comprimir(informes, tmp_path / 'informes.zip')])
+    lecturas = collections.Counter()
+    abrir = gfo.MiembroZip.abrir
+
+    def contar(miembro):
+        lecturas[miembro.nombre_miembro] += 1
+        return abrir(miembro)
+    monkeypatch.setattr(gfo.MiembroZip, 'abrir', contar)
+
+    hashes = {}
+    resultados = list(gfo.procesar_pdfs(miembros, directorio_cache=tmp_path / 'cache',
+                                        hashes=hashes))
+
+    assert len(lecturas) == len(informes) and set(lecturas.values()) == {1}
+    assert [resultado for _, resultado, _ in resultados] == [gfo.procesar_pdf(pdf) for pdf in informes]
+    assert [hashes[miembro] for miembro in miembros] == [gfo.hash_pdf(pdf) for pdf in informes]